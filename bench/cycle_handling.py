@@ -0,0 +1,93 @@
+"""
+Per-cycle read + handling cost of Avantes_Spectrometer, in simulation mode (no DLL / hardware).
+
+The DLL call (AVS_GetScopeData) is emulated by a memmove of a prepared spectrum into the
+ctypes input buffer, so only the Python side of the hot loop is measured:
+  - legacy:  fresh (c_double*npix)() per cycle, np.array() copy, astype, non in-place accumulation
+  - current: pooled ctypes buffers with cached zero-copy views, discriminator factor and
+             accumulation applied in place into preallocated arrays
+
+    python -m SciLab.bench.cycle_handling --ncy 5000 --npix 2048
+"""
+import argparse
+import ctypes
+import json
+import logging
+import time
+from ctypes import c_double
+import numpy as np
+
+from ..drivers.avantes_controller import Avantes_Spectrometer
+
+def make_spec(npix: int = 2048):
+    if Avantes_Spectrometer is None:
+        raise RuntimeError("avantes_spectrometer driver could not be imported")
+    spec = Avantes_Spectrometer()
+    spec.simulation_mode = True
+    spec.logger = logging.getLogger("bench.spec")
+    spec.npix_active = int(npix)
+    spec.npix_blind_left = 0
+    spec.reset_spec_data()
+    return spec
+
+class _Source:
+    """Stands in for the DLL: copies a fixed spectrum into the ctypes buffer it is given."""
+    def __init__(self, y: np.ndarray):
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        self.ptr = self.y.ctypes.data
+        self.nbytes = self.y.nbytes
+
+def _fill(buf, src: "_Source"):
+    ctypes.memmove(buf, src.ptr, src.nbytes)
+
+def _legacy_cycle(spec, ncy_read: int, src: _Source):
+    # read_data / handle_cycle_data as they were before the buffer pool
+    rc = (c_double * spec.npix_active)()
+    (c_double * spec.npix_blind_left)()
+    _fill(rc, src)
+    rc = np.array(rc)
+    rc = rc.astype(np.float64)
+    rc = rc * float(spec.discriminator_factor)
+    rcmax = rc.max()
+    rc.min()
+    if rcmax >= spec.eff_saturation_limit and spec.abort_on_saturation:
+        return
+    spec.sy = spec.sy + rc
+    spec.syy = spec.syy + rc**2
+    spec.sxy = spec.sxy + (ncy_read - 1) * rc
+    spec.ncy_handled += 1
+
+def _current_cycle(spec, ncy_read: int, src: _Source):
+    rc, rc_blind_left = spec.get_rc_buffers()
+    _fill(rc, src)
+    spec.handle_cycle_data(ncy_read, rc, rc_blind_left)
+
+def run(ncy: int = 5000, npix: int = 2048, seed: int = 0) -> dict:
+    """Mean per-cycle cost [us] of the legacy and current paths over ncy cycles."""
+    rng = np.random.default_rng(seed)
+    src = _Source(rng.random(npix) * 10000.0)
+    spec = make_spec(npix)
+    out = {"ncy": int(ncy), "npix": int(npix)}
+    for name, fn in (("legacy", _legacy_cycle), ("current", _current_cycle)):
+        spec.reset_spec_data()
+        for i in range(1, 51):  # warm up (pool, caches)
+            fn(spec, i, src)
+        spec.reset_spec_data()
+        t0 = time.perf_counter()
+        for i in range(1, ncy + 1):
+            fn(spec, i, src)
+        dt = time.perf_counter() - t0
+        out[f"{name}_us_per_cycle"] = 1e6 * dt / ncy
+        out[f"{name}_sy_checksum"] = float(spec.sy.sum())
+    out["speedup"] = out["legacy_us_per_cycle"] / out["current_us_per_cycle"]
+    return out
+
+def main():
+    p = argparse.ArgumentParser("bench.cycle_handling")
+    p.add_argument("--ncy", type=int, default=5000)
+    p.add_argument("--npix", type=int, default=2048)
+    args = p.parse_args()
+    print(json.dumps(run(args.ncy, args.npix), indent=2))
+
+if __name__ == "__main__":
+    main()
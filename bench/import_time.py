@@ -0,0 +1,70 @@
+"""
+Cold-start import cost of the CLI (or any module), measured with `python -X importtime` in a
+fresh interpreter. Fails (exit 1) when the cumulative import time exceeds the budget or when
+one of the heavy modules is imported eagerly, so it can gate CI.
+
+    python -m SciLab.bench.import_time --budget-ms 150
+    python -m SciLab.bench.import_time --module SciLab.ui.app --budget-ms 800 --allow plotly serial
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Sequence
+
+_ROOT = __package__.rsplit(".", 1)[0] if __package__ else "SciLab"
+# Only needed by a subcommand / tab, never at startup
+HEAVY = ["pandas", "scipy", "plotly", "pyarrow", "ctypes", "serial"]
+
+_LINE = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+def import_profile(module: str) -> Dict[str, int]:
+    """Cumulative import time [us] per module for one `import module` in a fresh interpreter."""
+    # Same sys.path as this process, so the package resolves the same way as with -m
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{out.stderr[-2000:]}")
+    prof: Dict[str, int] = {}
+    for ln in out.stderr.splitlines():
+        m = _LINE.match(ln)
+        if m:
+            prof[m.group(4)] = int(m.group(2))
+    return prof
+
+def run(module: str = f"{_ROOT}.cli.spectro", budget_ms: float = 150.0, repeat: int = 5,
+        heavy: Sequence[str] = HEAVY) -> dict:
+    """Best-of-repeat cumulative import time of module, the slowest imports and eager heavy modules."""
+    best: Dict[str, int] = {}
+    for _ in range(repeat):
+        prof = import_profile(module)
+        if not best or prof.get(module, 0) < best.get(module, 0):
+            best = prof
+    total_ms = best.get(module, 0) / 1000.0
+    eager: List[str] = sorted(h for h in heavy if h in best)
+    top = sorted(((k, v / 1000.0) for k, v in best.items() if k != module), key=lambda kv: -kv[1])[:10]
+    return {
+        "module": module,
+        "import_ms": total_ms,
+        "budget_ms": float(budget_ms),
+        "eager_heavy": eager,
+        "slowest_ms": dict(top),
+        "ok": total_ms <= budget_ms and not eager,
+    }
+
+def main():
+    p = argparse.ArgumentParser("bench.import_time")
+    p.add_argument("--module", default=f"{_ROOT}.cli.spectro")
+    p.add_argument("--budget-ms", type=float, default=150.0)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--allow", nargs="*", default=[], help="heavy modules allowed at import")
+    args = p.parse_args()
+    res = run(args.module, args.budget_ms, args.repeat, [h for h in HEAVY if h not in args.allow])
+    print(json.dumps(res, indent=2))
+    sys.exit(0 if res["ok"] else 1)
+
+if __name__ == "__main__":
+    main()
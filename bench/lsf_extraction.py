@@ -0,0 +1,78 @@
+"""
+LSF extraction cost on a synthetic run (one SIG + one DARK frame per laser line, Gaussian lines).
+
+  - legacy:  per-wavelength DataFrame filtering and row -> float conversion (get_normalized_lsf
+             as it was before the block implementation)
+  - current: core.analysis.build_lsf_map (pixel block extracted once, all LSFs in one operation)
+
+    python -m SciLab.bench.lsf_extraction --lines 500 --npix 2048
+"""
+import argparse
+import json
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from ..core.analysis import build_lsf_map
+
+def synthetic_frames(n_lines: int = 500, npix: int = 2048, seed: int = 0) -> pd.DataFrame:
+    """Wide frame table (Wavelength + Pixel_i columns) with a SIG and a DARK row per line."""
+    rng = np.random.default_rng(seed)
+    x = np.arange(npix, dtype=float)
+    lambdas = np.linspace(300.0, 600.0, n_lines)
+    centers = np.linspace(20, npix - 20, n_lines)
+    sig = 1000.0 + 50000.0 * np.exp(-0.5 * ((x[None, :] - centers[:, None]) / 2.5) ** 2) + rng.normal(0, 20, (n_lines, npix))
+    dark = 1000.0 + rng.normal(0, 20, (n_lines, npix))
+    labels = [f"{l:.2f}" for l in lambdas]
+    rows = np.empty((2 * n_lines, npix))
+    rows[0::2], rows[1::2] = sig, dark
+    df = pd.DataFrame(rows, columns=[f"Pixel_{i}" for i in range(npix)])
+    df.insert(0, "Wavelength", [v for l in labels for v in (l, f"{l}_dark")])
+    return df
+
+def _legacy_lsf(df: pd.DataFrame, wavelength: str, sat_thresh: float = 65535.0) -> Optional[np.ndarray]:
+    pixel_cols = [c for c in df.columns if str(c).startswith("Pixel_")]
+    sig_rows = df[df["Wavelength"] == wavelength]
+    dark_rows = df[df["Wavelength"] == f"{wavelength}_dark"]
+    if sig_rows.empty or dark_rows.empty: return None
+    sig = sig_rows.iloc[-1][pixel_cols].astype(float).to_numpy()
+    dark = dark_rows.iloc[-1][pixel_cols].astype(float).to_numpy()
+    if np.any(sig >= sat_thresh): return None
+    corrected = sig - dark
+    corrected -= np.min(corrected)
+    denom = float(np.max(corrected))
+    if not np.isfinite(denom) or denom <= 0: return None
+    return corrected / denom
+
+def _legacy_map(df: pd.DataFrame, wavelengths: List[str]) -> Dict[str, np.ndarray]:
+    out = {}
+    for w in wavelengths:
+        lsf = _legacy_lsf(df, w)
+        if lsf is not None:
+            out[w] = lsf
+    return out
+
+def run(n_lines: int = 500, npix: int = 2048, seed: int = 0) -> dict:
+    df = synthetic_frames(n_lines, npix, seed)
+    waves = [w for w in df["Wavelength"] if not w.endswith("_dark")]
+    out = {"lines": int(n_lines), "npix": int(npix)}
+    res = {}
+    for name, fn in (("legacy", _legacy_map), ("current", build_lsf_map)):
+        t0 = time.perf_counter()
+        res[name] = fn(df, waves)
+        out[f"{name}_s"] = time.perf_counter() - t0
+    out["max_abs_diff"] = max(float(np.max(np.abs(res["legacy"][w] - res["current"][w]))) for w in res["legacy"])
+    out["same_keys"] = list(res["legacy"]) == list(res["current"])
+    out["speedup"] = out["legacy_s"] / out["current_s"]
+    return out
+
+def main():
+    p = argparse.ArgumentParser("bench.lsf_extraction")
+    p.add_argument("--lines", type=int, default=500)
+    p.add_argument("--npix", type=int, default=2048)
+    args = p.parse_args()
+    print(json.dumps(run(args.lines, args.npix), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Full MeasurementRunner run against the simulated rig (drivers.sim_rig): Auto-IT, signal and
+dark acquisition for every enabled laser, through the real OBIS / CUBE / relay drivers on
+pseudo-terminals (POSIX only).
+
+Reports the wall time next to the modelled, host independent figures (acquisition time,
+cycles, device commands) and the final IT per laser; with the same config and --seed the
+Auto-IT path and frame counts are identical on every machine. --time-scale 0.1 sleeps a
+tenth of every modelled wait.
+
+    python -m SciLab.bench.sim_run --time-scale 0.1 --n-sig 50 --n-dark 50
+"""
+import argparse
+import contextlib
+import copy
+import json
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import pyarrow.parquet as pq
+
+from ..core.config import AppConfig, DEFAULT_CONFIG, load_config
+from ..core.measurement import MeasurementRunner
+from ..drivers import LOGGER
+from ..drivers.sim_rig import SimRig, DetectorModel
+
+def sim_config(base_dir: str, config_path: Optional[str] = None, n_sig: int = 50, n_dark: int = 50,
+               pipeline: bool = False, strategy: str = "step") -> AppConfig:
+    """Config for a simulated run: no IT cache or shared dark library (they would carry state between runs)."""
+    cfg = load_config(config_path) if config_path else copy.deepcopy(DEFAULT_CONFIG)
+    cfg.output.base_dir = base_dir
+    cfg.output.it_cache_path = None
+    cfg.output.dark_cache_dir = None
+    cfg.output.write_csv = False
+    cfg.measure.use_it_cache = False
+    cfg.measure.n_sig, cfg.measure.n_dark = int(n_sig), int(n_dark)
+    cfg.measure.pipeline = bool(pipeline)
+    cfg.measure.autoit_strategy = strategy
+    return cfg
+
+def run(config_path: Optional[str] = None, time_scale: float = 1.0, seed: int = 0, n_sig: int = 50,
+        n_dark: int = 50, pipeline: bool = False, strategy: str = "step") -> dict:
+    with tempfile.TemporaryDirectory(prefix="scilab_sim_") as tmp:
+        cfg = sim_config(tmp, config_path, n_sig, n_dark, pipeline, strategy)
+        with SimRig(cfg, DetectorModel(seed=seed), time_scale=time_scale) as rig:
+            res = MeasurementRunner(cfg, sim_spectrometer=rig.spectrometer).run()
+            stats = rig.stats()
+        frames = Path(res.run_dir) / "frames.parquet"
+        it_ms = {}
+        if frames.exists():
+            t = pq.read_table(frames, columns=["LaserID", "IntegrationMS"]).to_pydict()
+            it_ms = {l: round(float(v), 6) for l, v in zip(t["LaserID"], t["IntegrationMS"]) if not l.endswith("_dark")}
+    return {"wall_time_s": res.wall_time_s, "success": res.success_map, "it_ms": it_ms,
+            "pipeline": bool(pipeline), "strategy": strategy, "seed": int(seed), **stats}
+
+def main():
+    p = argparse.ArgumentParser("bench.sim_run")
+    p.add_argument("--config", default=None, help="YAML config (default: built-in laser set)")
+    p.add_argument("--time-scale", type=float, default=1.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--n-sig", type=int, default=50)
+    p.add_argument("--n-dark", type=int, default=50)
+    p.add_argument("--pipeline", action="store_true")
+    p.add_argument("--strategy", choices=["step", "model"], default="step")
+    args = p.parse_args()
+    # Keep stdout for the JSON result
+    LOGGER.setLevel(logging.WARNING)
+    with contextlib.redirect_stdout(sys.stderr):
+        out = run(args.config, args.time_scale, args.seed, args.n_sig, args.n_dark, args.pipeline, args.strategy)
+    print(json.dumps(out, indent=2))
+
+if __name__ == "__main__":
+    main()
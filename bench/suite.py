@@ -0,0 +1,356 @@
+"""
+Benchmark suite for acquisition, logging, analysis and display, without hardware. Results are
+written as one JSON document (environment + metrics per benchmark) for regression tracking;
+--compare checks them against an earlier result file.
+
+Metric names carry their direction: *_ms / *_us / *_s are times (lower is better), *_fps are
+rates (higher is better), everything else (frames, sizes, counts) is informational.
+
+    python -m SciLab.bench.suite --output bench.json
+    python -m SciLab.bench.suite --quick --only autoit datalogger_flush
+    python -m SciLab.bench.suite --output new.json --compare bench.json --tolerance 0.25
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+def _timed(fn: Callable[[], object], repeat: int = 5) -> Dict[str, float]:
+    """Best and median of 'repeat' calls [ms]."""
+    ts = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        ts.append(1000.0 * (time.perf_counter() - t0))
+    return {"best_ms": float(np.min(ts)), "median_ms": float(np.median(ts))}
+
+# -----------------------------------------------------------------------------
+# Acquisition
+# -----------------------------------------------------------------------------
+def bench_cycle_handling(quick: bool) -> dict:
+    """Per-cycle read + handle_cycle_data cost of Avantes_Spectrometer (see bench.cycle_handling)."""
+    from . import cycle_handling
+    r = cycle_handling.run(ncy=1000 if quick else 5000, npix=2048)
+    return {"ncy": r["ncy"], "npix": r["npix"], "current_us": r["current_us_per_cycle"], "legacy_us": r["legacy_us_per_cycle"]}
+
+def bench_calc_msl(quick: bool) -> dict:
+    """Mean / std / straight-line rms from the accumulated sums (end of every measurement)."""
+    from ..drivers.spec_xfus import calc_msl
+    rng = np.random.default_rng(0)
+    out = {"npix": 2048}
+    for ncy in (10, 1000):
+        rc = rng.normal(10000.0, 30.0, (ncy, 2048))
+        x = np.arange(ncy)
+        sy, syy, sxy = rc.sum(0), (rc * rc).sum(0), (x[:, None] * rc).sum(0)
+        t = _timed(lambda: calc_msl("bench", x, sxy, sy, syy), repeat=50 if quick else 200)
+        out[f"ncy{ncy}_us"] = 1000.0 * t["best_ms"]
+    return out
+
+def bench_autoit(quick: bool) -> dict:
+    """
+    Frames AutoIT.tune needs to converge on the simulated detector (one line, peak rate
+    5000 counts/ms) from several start ITs, per strategy; no real waiting.
+    """
+    from ..core.auto_it import AutoIT, AutoITParams
+    from ..core.config import MeasureConfig
+    from ..drivers.sim_rig import SimSpectrometer, SimClock, DetectorModel
+    p = MeasureConfig()
+    out = {}
+    for strategy in ("step", "model"):
+        frames, ok, t_ms = [], [], 0.0
+        for start_it in (0.5, 2.4, 80.0, 1000.0):
+            spec = SimSpectrometer(DetectorModel(seed=1), SimClock(0.0), illumination=lambda: [(1024.0, 5000.0)])
+            auto = AutoIT(AutoITParams(it_min_ms=p.it_min_ms, it_max_ms=p.it_max_ms, target_low=p.target_low,
+                                       target_high=p.target_high, step_up_ms=p.step_up_ms, step_down_ms=p.step_down_ms,
+                                       max_adjust_iters=p.max_adjust_iters, sat_thresh=p.sat_thresh, strategy=strategy))
+            def read_peak():
+                spec.measure(1)
+                return float(spec.rcm.max()), spec.rcm
+            t0 = time.perf_counter()
+            _, _, success = auto.tune(read_peak, spec.set_it, start_it)
+            t_ms += 1000.0 * (time.perf_counter() - t0)
+            frames.append(auto.last_iters)
+            ok.append(bool(success))
+        out[strategy] = {"frames": frames, "frames_total": int(sum(frames)), "all_converged": all(ok), "tune_ms": t_ms}
+    return out
+
+def bench_measurement_sim(quick: bool) -> dict:
+    """Full MeasurementRunner run on the simulated rig at time scale 0 (software overhead only)."""
+    if os.name != "posix":
+        return {"skipped": "simulated serial devices need pseudo-terminals"}
+    from . import sim_run
+    r = sim_run.run(time_scale=0.0, n_sig=10 if quick else 50, n_dark=10 if quick else 50)
+    return {"wall_s": r["wall_time_s"], "measurements": r["spectrometer"]["measurements"],
+            "cycles": r["spectrometer"]["cycles"], "acquisition_model_s": r["spectrometer"]["acquisition_model_s"],
+            "all_success": all(v for k, v in r["success"].items() if k in r["it_ms"])}
+
+# -----------------------------------------------------------------------------
+# Logging
+# -----------------------------------------------------------------------------
+def bench_datalogger_flush(quick: bool) -> dict:
+    """
+    DataLogger.flush cost as a run grows: a SIG + DARK frame pair is added and flushed per
+    laser, as MeasurementRunner does. Reports the mean and the last flush per run size.
+    """
+    from ..core.datalogger import DataLogger, prepare_run_dir
+    sizes = (100, 1000) if quick else (100, 1000, 4000)
+    rng = np.random.default_rng(0)
+    frame = rng.normal(1000.0, 20.0, 2048)
+    out = {"npix": 2048, "frames_per_flush": 2}
+    for write_csv in (False, True):
+        for n in sizes:
+            with tempfile.TemporaryDirectory(prefix="scilab_bench_") as tmp:
+                logger = DataLogger(prepare_run_dir(tmp, "BENCH"), write_csv=write_csv)
+                ts = []
+                for i in range(n // 2):
+                    logger.add_frame("2025-01-01T00:00:00", str(i), "SIG", 0, 10.0, frame)
+                    logger.add_frame("2025-01-01T00:00:00", f"{i}_dark", "DARK", 0, 10.0, frame)
+                    t0 = time.perf_counter()
+                    logger.flush()
+                    ts.append(1000.0 * (time.perf_counter() - t0))
+                logger.close()
+            key = f"{'csv_' if write_csv else ''}frames{n}"
+            out[f"{key}_mean_ms"] = float(np.mean(ts))
+            out[f"{key}_last_ms"] = float(np.mean(ts[-10:]))
+    return out
+
+# -----------------------------------------------------------------------------
+# Analysis
+# -----------------------------------------------------------------------------
+def write_synthetic_run(base_dir: str, n_lines: int, npix: int = 2048, seed: int = 0) -> Path:
+    """frames.parquet of a run with one SIG + DARK pair per line (Gaussian lines on a cubic dispersion)."""
+    from ..core.datalogger import DataLogger, prepare_run_dir
+    rng = np.random.default_rng(seed)
+    x = np.arange(npix, dtype=float)
+    centers = np.linspace(20.0, npix - 20.0, n_lines)
+    lambdas = 300.0 + 0.2 * centers - 1e-5 * centers ** 2
+    paths = prepare_run_dir(base_dir, f"SYN{n_lines}")
+    with DataLogger(paths, write_csv=False) as logger:
+        for c, lam in zip(centers, lambdas):
+            sig = 1000.0 + 50000.0 * np.exp(-0.5 * ((x - c) / 2.5) ** 2) + rng.normal(0, 20, npix)
+            logger.add_frame("2025-01-01T00:00:00", f"{lam:.3f}", "SIG", 0, 10.0, sig)
+            logger.add_frame("2025-01-01T00:00:00", f"{lam:.3f}_dark", "DARK", 0, 10.0, 1000.0 + rng.normal(0, 20, npix))
+            logger.flush()
+    return paths.parquet_path
+
+def bench_analyze_run(quick: bool) -> dict:
+    """
+    analyze_run on synthetic runs: computed (no cache), reopened from the cache sidecar, and
+    the screen-resolution LSF / SDF figures of the Analysis tab.
+    """
+    from ..core.analysis import analyze_run, fig_lsf, fig_sdf, lsf_detail, sdf_detail
+    out = {}
+    for n in ((10, 100) if quick else (10, 100, 1000)):
+        with tempfile.TemporaryDirectory(prefix="scilab_bench_") as tmp:
+            pq_path = str(write_synthetic_run(tmp, n))
+            r = {"compute": _timed(lambda: analyze_run(pq_path, use_cache=False), repeat=3)}
+            analyze_run(pq_path)   # writes the sidecar
+            r["cached"] = _timed(lambda: analyze_run(pq_path), repeat=3)
+            res = analyze_run(pq_path)
+            lsf_map, sdf, ordered = res["lsf_map"], res["sdf"], res["ordered"]
+            r["figures"] = _timed(lambda: (fig_lsf(lsf_map, lsf_detail(lsf_map)),
+                                           fig_sdf(sdf, ordered, sdf_detail(sdf, ordered))), repeat=3)
+            r["lines_valid"] = len(ordered)
+        out[f"lines{n}"] = r
+    return out
+
+# -----------------------------------------------------------------------------
+# Display
+# -----------------------------------------------------------------------------
+def _live_frames(n: int = 16) -> List[np.ndarray]:
+    rng = np.random.default_rng(0)
+    x = np.arange(2048)
+    return [rng.normal(1000.0, 50.0, 2048) + 50000.0 * np.exp(-0.5 * ((x - 1024 - k) / 3.0) ** 2) for k in range(n)]
+
+def _draw_rate(app, view, frames: List[np.ndarray], n: int) -> dict:
+    for y in frames:  # warm up
+        view.update_live(y, float(y.max()), 10.0, "bench")
+        app.processEvents()
+    t0 = time.perf_counter()
+    for i in range(n):
+        y = frames[i % len(frames)]
+        view.update_live(y, float(y.max()), 10.0, "bench")
+        app.processEvents()
+    dt = time.perf_counter() - t0
+    return {"frames": n, "draw_fps": n / dt, "per_frame_ms": 1000.0 * dt / n}
+
+def bench_live_view(quick: bool) -> dict:
+    """
+    LiveView frame throughput (offscreen Qt, 2048-pixel frames) for both backends:
+      - native: pyqtgraph update_live draw rate
+      - web_payload: encoding one frame for the Plotly page (LiveView.web_update_js), next to
+        the former JSON number list; needs no web engine
+      - web: update_live on the Plotly page (encoding + runJavaScript), QtWebEngine only
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtWidgets import QApplication
+        from ..ui import live_view
+    except ImportError as e:
+        return {"skipped": f"Qt not available: {e}"}
+    try:    # must be imported before the QApplication exists
+        import PyQt5.QtWebEngineWidgets  # noqa: F401
+        has_web = True
+    except ImportError:
+        has_web = False
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    frames = _live_frames()
+    n = 200 if quick else 1000
+    out: Dict[str, object] = {}
+
+    y = frames[0]
+    reps = 200 if quick else 1000
+    enc = _timed(lambda: [live_view.LiveView.web_update_js(y, "bench") for _ in range(reps)], repeat=3)
+    old = _timed(lambda: [f"liveUpdate({json.dumps(y.tolist())}, {json.dumps('bench')});" for _ in range(reps)], repeat=3)
+    out["web_payload"] = {"encode_us": 1000.0 * enc["best_ms"] / reps, "bytes": len(live_view.LiveView.web_update_js(y, "bench")),
+                          "json_list_encode_us": 1000.0 * old["best_ms"] / reps,
+                          "json_list_bytes": len(json.dumps(y.tolist()))}
+
+    if live_view.pg is not None:
+        view = live_view.LiveView()
+        view.resize(1200, 600)
+        view.show()
+        out["native"] = dict(backend="pyqtgraph", **_draw_rate(app, view, frames, n))
+        view.close()
+    else:
+        out["native"] = {"skipped": "pyqtgraph not installed"}
+
+    if has_web:
+        pg, live_view.pg = live_view.pg, None   # force the Plotly page
+        try:
+            view = live_view.LiveView()
+        finally:
+            live_view.pg = pg
+        view.resize(1200, 600)
+        view.show()
+        deadline = time.monotonic() + 30.0
+        while not view._ready and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        if view._ready:
+            out["web"] = dict(backend="plotly", **_draw_rate(app, view, frames, n))
+        else:
+            out["web"] = {"error": "Plotly page did not load"}
+        view.close()
+    else:
+        out["web"] = {"skipped": "PyQtWebEngine not installed"}
+    return out
+
+BENCHMARKS: Dict[str, Callable[[bool], dict]] = {
+    "cycle_handling": bench_cycle_handling,
+    "calc_msl": bench_calc_msl,
+    "autoit": bench_autoit,
+    "measurement_sim": bench_measurement_sim,
+    "datalogger_flush": bench_datalogger_flush,
+    "analyze_run": bench_analyze_run,
+    "live_view": bench_live_view,
+}
+
+# -----------------------------------------------------------------------------
+# Results
+# -----------------------------------------------------------------------------
+def environment() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count()}
+
+def run(names: Optional[Sequence[str]] = None, quick: bool = False) -> Dict[str, object]:
+    results: Dict[str, object] = {}
+    for name in names or list(BENCHMARKS):
+        t0 = time.perf_counter()
+        try:
+            results[name] = BENCHMARKS[name](quick)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+        print(f"{name}: {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+    return {"env": environment(), "quick": quick, "results": results}
+
+def _flatten(d: Dict[str, object], prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out.update(_flatten(v, key))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+def _errors(d: Dict[str, object], prefix: str = "") -> List[str]:
+    out = []
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out += _errors(v, key)
+        elif k == "error":
+            out.append(f"{key}: {v}")
+    return out
+
+def compare(new: Dict[str, object], old: Dict[str, object], tolerance: float = 0.25) -> List[str]:
+    """
+    Failures of 'new' against 'old': benchmark errors, metrics of 'old' that 'new' lacks
+    (crashed or skipped part of a benchmark) and metrics worse by more than 'tolerance'
+    (relative). Only the benchmarks that ran in 'new' are compared (--only); results of
+    different sizes (--quick vs full) are not compared at all.
+    """
+    if bool(new.get("quick")) != bool(old.get("quick")):
+        return [f"cannot compare a quick={bool(new.get('quick'))} result with a quick={bool(old.get('quick'))} one"]
+    ran = set(new["results"])
+    a = _flatten(new["results"])
+    b = {k: v for k, v in _flatten(old["results"]).items() if k.split(".", 1)[0] in ran}
+    bad = [f"error {e}" for e in _errors(new["results"])]
+    bad += [f"missing {key} (was {b[key]:.4g})" for key in sorted(set(b) - set(a))]
+    for key in sorted(set(a) & set(b)):
+        last = key.rsplit(".", 1)[-1]
+        if b[key] <= 0:
+            continue
+        ratio = a[key] / b[key]
+        if last.endswith(("_ms", "_us", "_s")) and ratio > 1.0 + tolerance:
+            bad.append(f"{key}: {b[key]:.4g} -> {a[key]:.4g} ({ratio:.2f}x)")
+        elif last.endswith("_fps") and ratio < 1.0 / (1.0 + tolerance):
+            bad.append(f"{key}: {b[key]:.4g} -> {a[key]:.4g} ({ratio:.2f}x)")
+    return bad
+
+def main():
+    p = argparse.ArgumentParser("bench.suite")
+    p.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=None)
+    p.add_argument("--quick", action="store_true", help="smaller sizes / fewer repeats")
+    p.add_argument("--output", default=None, help="write the result JSON here (default: stdout)")
+    p.add_argument("--compare", default=None, help="earlier result JSON; exit 1 on regressions")
+    p.add_argument("--tolerance", type=float, default=0.25)
+    args = p.parse_args()
+
+    from ..drivers import LOGGER
+    LOGGER.setLevel(logging.WARNING)
+    with contextlib.redirect_stdout(sys.stderr):   # driver / runner prints
+        res = run(args.only, args.quick)
+    text = json.dumps(res, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            bad = compare(res, json.load(f), args.tolerance)
+        for line in bad:
+            print(f"FAIL {line}", file=sys.stderr)
+        sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()
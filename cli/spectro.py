@@ -1,10 +1,12 @@
 import argparse, sys, json
 from pathlib import Path
 from ..core.config import load_config, DEFAULT_CONFIG
-from ..core.measurement import MeasurementRunner
-from ..core.analysis import analyze_run
+
+# Subcommands import their heavy modules (drivers/pyserial/ctypes, pandas/scipy/plotly)
+# themselves, so `spectro --help` and argument errors stay fast.
 
 def cmd_measure(args):
+    from ..core.measurement import MeasurementRunner
     try:
         cfg = load_config(args.config) if args.config else DEFAULT_CONFIG
     except Exception as e:
@@ -12,10 +14,11 @@ def cmd_measure(args):
         cfg = DEFAULT_CONFIG
     runner = MeasurementRunner(cfg)
     res = runner.run()
-    print(json.dumps({"run_dir": res.run_dir, "success": res.success_map}, indent=2))
+    print(json.dumps({"run_dir": res.run_dir, "success": res.success_map, "wall_time_s": res.wall_time_s}, indent=2))
 
 def cmd_analyze(args):
-    res = analyze_run(args.parquet, poly_order=args.poly_order)
+    from ..core.analysis import analyze_run
+    res = analyze_run(args.parquet, poly_order=args.poly_order, use_cache=not args.no_cache)
     out = Path(args.output or Path(args.parquet).parent / "analysis.json")
     out.write_text(json.dumps({
         "poly": res["poly"].tolist(),
@@ -27,6 +30,35 @@ def cmd_analyze(args):
     }, indent=2))
     print(f"Wrote {out}")
 
+def cmd_recover(args):
+    from ..core.datalogger import recover_run
+    try:
+        path = recover_run(args.run_dir)
+    except RuntimeError as e:
+        print(f"Not recovered: {e}"); sys.exit(1)
+    print(f"Wrote {path}" if path else f"No frames in {args.run_dir}")
+
+def cmd_analyze_batch(args):
+    from ..core.batch_analysis import analyze_batch
+    try:
+        cfg = load_config(args.config) if args.config else DEFAULT_CONFIG
+    except Exception as e:
+        print(f"Config load failed: {e}\nUsing defaults.")
+        cfg = DEFAULT_CONFIG
+    base_dir = args.base_dir or cfg.output.base_dir
+    df, errors = analyze_batch(base_dir, poly_order=args.poly_order, jobs=args.jobs, use_cache=not args.no_cache,
+                               recover=args.recover)
+    out = Path(args.output or Path(base_dir) / "analysis_summary.csv")
+    if out.suffix == ".parquet":
+        df.to_parquet(out, index=False)
+    else:
+        df.to_csv(out, index=False)
+    n_runs = df["run_dir"].nunique() if not df.empty else 0
+    n_cached = df.loc[df["cached"], "run_dir"].nunique() if not df.empty else 0
+    print(f"Analyzed {n_runs} runs ({n_cached} from cache, {len(errors)} failed). Wrote {out}")
+    for run_dir, err in errors.items():
+        print(f"  {run_dir}: {err}")
+
 def main():
     p = argparse.ArgumentParser("spectro")
     sub = p.add_subparsers(dest="cmd")
@@ -39,8 +71,24 @@ def main():
     a.add_argument("parquet", type=str, help="Path to frames.parquet")
     a.add_argument("--poly-order", type=int, default=3)
     a.add_argument("--output", type=str)
+    a.add_argument("--no-cache", action="store_true", help="Recompute even if a cached result exists")
     a.set_defaults(func=cmd_analyze)
 
+    r = sub.add_parser("recover", help="Rebuild frames.parquet of an interrupted run from frames.arrows")
+    r.add_argument("run_dir", type=str, help="Path to the run_* directory")
+    r.set_defaults(func=cmd_recover)
+
+    b = sub.add_parser("analyze-batch", help="Analyze all runs under output.base_dir into one summary table")
+    b.add_argument("--config", type=str, help="Path to SciLab.yaml (for output.base_dir)")
+    b.add_argument("--base-dir", type=str, help="Directory with run_* folders (overrides the config)")
+    b.add_argument("--poly-order", type=int, default=3)
+    b.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    b.add_argument("--output", type=str, help="Summary .csv or .parquet (default: <base_dir>/analysis_summary.csv)")
+    b.add_argument("--no-cache", action="store_true", help="Recompute even if a cached result exists")
+    b.add_argument("--recover", action="store_true",
+                   help="Rebuild frames.parquet of interrupted runs first (otherwise they are skipped)")
+    b.set_defaults(func=cmd_analyze_batch)
+
     args = p.parse_args()
     if not hasattr(args, "func"):
         p.print_help(); sys.exit(1)
@@ -1,45 +1,93 @@
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Tuple, Sequence, Callable, Mapping
 import numpy as np
 import pandas as pd
 from scipy.interpolate import interp1d
 from scipy.optimize import curve_fit
 import plotly.graph_objs as go
+import pyarrow.parquet as pq
+
+from . import analysis_cache
+from .datalogger import SPECTRUM_COLUMN
+from .decimate import LineDetail, HeatmapDetail
+from .plot_data import float32
 
 def _pixel_cols(df: pd.DataFrame) -> List[str]:
     return [c for c in df.columns if str(c).startswith("Pixel_")]
 
-def get_normalized_lsf(df: pd.DataFrame, wavelength: str, sat_thresh: float = 65535.0, use_latest=True) -> Optional[np.ndarray]:
-    pixel_cols = _pixel_cols(df)
-    if not pixel_cols: return None
+def frame_block(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """(labels, pixel block): the Wavelength/LaserID column as an array and all spectra as one (nframes, npix) float array."""
+    labels = df["Wavelength" if "Wavelength" in df.columns else "LaserID"].astype(str).to_numpy()
+    if SPECTRUM_COLUMN in df.columns:
+        block = np.stack([np.asarray(v, dtype=float) for v in df[SPECTRUM_COLUMN]]) if len(df) else np.empty((0, 0))
+    else:
+        block = df[_pixel_cols(df)].to_numpy(dtype=float)
+    return labels, block
 
-    sig_rows = df[df["Wavelength"] == wavelength]
-    dark_rows = df[df["Wavelength"] == f"{wavelength}_dark"]
-    if sig_rows.empty or dark_rows.empty: return None
+def load_frames(parquet_path: str, wavelengths: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (labels, pixel block) straight from frames.parquet, reading only the label and spectrum
+    columns. With 'wavelengths', only frames of those lines and their darks are read: the
+    filter is pushed down to the row groups (DataLogger writes one per laser), so memory
+    follows the selected lines rather than the whole run.
+    """
+    schema = pq.read_schema(parquet_path)
+    label_col = "Wavelength" if "Wavelength" in schema.names else "LaserID"
+    pix_cols = [SPECTRUM_COLUMN] if SPECTRUM_COLUMN in schema.names else [n for n in schema.names if n.startswith("Pixel_")]
+    filters = None
+    if wavelengths is not None:
+        wanted = [str(w) for w in wavelengths]
+        filters = [(label_col, "in", wanted + [f"{w}_dark" for w in wanted])]
+    t = pq.read_table(parquet_path, columns=[label_col] + pix_cols, filters=filters)
+    labels = np.asarray(t.column(label_col).to_pylist(), dtype=str)
+    if t.num_rows == 0:
+        return labels, np.empty((0, 0))
+    if pix_cols == [SPECTRUM_COLUMN]:
+        spec = t.column(SPECTRUM_COLUMN).combine_chunks()
+        block = spec.flatten().to_numpy(zero_copy_only=False).astype(float, copy=False).reshape(t.num_rows, -1)
+    else:
+        block = np.column_stack([t.column(c).to_numpy() for c in pix_cols]).astype(float, copy=False)
+    return labels, block
 
-    sig_row = sig_rows.iloc[-1] if use_latest else sig_rows.iloc[0]
-    dark_row = dark_rows.iloc[-1] if use_latest else dark_rows.iloc[0]
+def _row_index(labels: np.ndarray, use_latest: bool = True) -> Dict[str, int]:
+    """Row of the latest (or first) frame per label."""
+    if use_latest:
+        uniq, first_rev = np.unique(labels[::-1], return_index=True)
+        rows = labels.size - 1 - first_rev
+    else:
+        uniq, rows = np.unique(labels, return_index=True)
+    return dict(zip(uniq.tolist(), rows.tolist()))
 
-    sig = sig_row[pixel_cols].astype(float).to_numpy()
-    dark = dark_row[pixel_cols].astype(float).to_numpy()
-    if sig.shape != dark.shape or sig.size == 0: return None
-    if np.any(sig >= sat_thresh): return None
+def normalized_lsf_block(labels: np.ndarray, block: np.ndarray, wavelengths: List[str], sat_thresh: float = 65535.0,
+                         use_latest: bool = True) -> Tuple[List[str], np.ndarray]:
+    """
+    Dark-subtracted, min/max normalized LSFs of all wavelengths at once.
+    Returns the wavelengths with a valid LSF (signal and dark present, not saturated, non-flat)
+    and their LSFs as a (n, npix) array in the same order.
+    """
+    rows = _row_index(labels, use_latest)
+    keys = [w for w in wavelengths if w in rows and f"{w}_dark" in rows]
+    if not keys or block.size == 0:
+        return [], np.empty((0, block.shape[1] if block.ndim == 2 else 0))
+    sig = block[[rows[w] for w in keys]]
+    corr = sig - block[[rows[f"{w}_dark"] for w in keys]]
+    corr -= corr.min(axis=1, keepdims=True)
+    denom = corr.max(axis=1)
+    ok = ~(sig >= sat_thresh).any(axis=1) & np.isfinite(denom) & (denom > 0)
+    lsfs = corr[ok] / denom[ok, None]
+    return [w for w, good in zip(keys, ok) if good], lsfs
 
-    corrected = sig - dark
-    corrected -= np.min(corrected)
-    denom = float(np.max(corrected))
-    if not np.isfinite(denom) or denom <= 0: return None
-    return corrected / denom
+def get_normalized_lsf(df: pd.DataFrame, wavelength: str, sat_thresh: float = 65535.0, use_latest=True) -> Optional[np.ndarray]:
+    labels, block = frame_block(df)
+    keys, lsfs = normalized_lsf_block(labels, block, [wavelength], sat_thresh, use_latest)
+    return lsfs[0] if keys else None
 
 def _peak_pixel(y: np.ndarray) -> int:
     return int(np.argmax(y))
 
 def build_lsf_map(df: pd.DataFrame, wavelengths: List[str], sat_thresh: float = 65535.0) -> Dict[str, np.ndarray]:
-    out: Dict[str, np.ndarray] = {}
-    for w in wavelengths:
-        lsf = get_normalized_lsf(df, w, sat_thresh=sat_thresh)
-        if lsf is not None:
-            out[w] = lsf
-    return out
+    labels, block = frame_block(df)
+    keys, lsfs = normalized_lsf_block(labels, block, [str(w) for w in wavelengths], sat_thresh)
+    return dict(zip(keys, lsfs))
 
 def build_sdf(lsf_map: Dict[str, np.ndarray]) -> Tuple[np.ndarray, List[str]]:
     if not lsf_map: return np.empty((0,)), []
@@ -47,94 +95,247 @@ def build_sdf(lsf_map: Dict[str, np.ndarray]) -> Tuple[np.ndarray, List[str]]:
     arr = np.stack([lsf_map[k] for k in keys], axis=0)
     return arr, keys
 
-def fit_dispersion(peak_pixels: List[int], wavelengths_nm: List[float], order: int = 3) -> np.ndarray:
+def fit_dispersion(peak_pixels: Sequence[float], wavelengths_nm: List[float], order: int = 3) -> np.ndarray:
     x = np.array(peak_pixels, dtype=float)
     y = np.array(wavelengths_nm, dtype=float)
     a = np.polyfit(x, y, deg=order)
     return a  # np.polyval(a, x) for fitted
 
+def _row_scale(sdf: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Per-row argmax, minimum and span (max - min) and a flag for rows with a finite, positive span."""
+    p = np.argmax(sdf, axis=1)
+    lo = sdf.min(axis=1)
+    span = sdf[np.arange(sdf.shape[0]), p] - lo
+    ok = np.isfinite(span) & (span > 0)
+    return p, lo, np.where(ok, span, 1.0), ok
+
+def peak_centers(sdf: np.ndarray) -> np.ndarray:
+    """
+    Sub-pixel peak position of every row of a (n_lines, npix) array: three-point Gaussian
+    (log-parabola) fit around the maximum, parabolic where the neighbours are not positive
+    (after shifting the row minimum to 0).
+    """
+    sdf = np.atleast_2d(np.asarray(sdf, dtype=float))
+    n, npix = sdf.shape
+    if n == 0 or npix == 0:
+        return np.full(n, np.nan)
+    p, lo, span, ok = _row_scale(sdf)
+    r = np.arange(n)
+    inner = ok & (p > 0) & (p < npix - 1)
+    a = (sdf[r, np.maximum(p - 1, 0)] - lo) / span
+    b = (sdf[r, p] - lo) / span
+    c = (sdf[r, np.minimum(p + 1, npix - 1)] - lo) / span
+    gauss = inner & (a > 0) & (c > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        la, lb, lc = (np.log(np.where(gauss, v, 1.0)) for v in (a, b, c))
+        dg = 0.5 * (la - lc) / (la - 2.0 * lb + lc)
+        dp = 0.5 * (a - c) / (a - 2.0 * b + c)
+    delta = np.where(gauss, dg, np.where(inner, dp, 0.0))
+    delta = np.where(np.isfinite(delta) & (np.abs(delta) <= 1.0), delta, 0.0)
+    out = p + delta
+    out[~ok] = np.nan
+    return out
+
+def fwhm_pixels(sdf: np.ndarray) -> np.ndarray:
+    """
+    FWHM in pixels of every row of a (n_lines, npix) array: outermost samples at or above half
+    maximum, with the crossings linearly interpolated towards their outer neighbours.
+    """
+    sdf = np.atleast_2d(np.asarray(sdf, dtype=float))
+    n, npix = sdf.shape
+    if n == 0 or npix == 0:
+        return np.full(n, np.nan)
+    p, lo, span, ok = _row_scale(sdf)
+    level = lo + 0.5 * span
+    above = sdf >= level[:, None]
+    iL = np.argmax(above, axis=1)
+    iR = npix - 1 - np.argmax(above[:, ::-1], axis=1)
+    r = np.arange(n)
+
+    def crossing(i_in, i_out):
+        v_in, v_out = sdf[r, i_in], sdf[r, i_out]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (level - v_in) / (v_out - v_in)
+        # No outer neighbour (edge) or flat step: the crossing is the last sample above half
+        t = np.where((i_out != i_in) & np.isfinite(t), t, 0.0)
+        return i_in + t * (i_out - i_in)
+
+    out = crossing(iR, np.minimum(iR + 1, npix - 1)) - crossing(iL, np.maximum(iL - 1, 0))
+    out[~ok] = np.nan
+    return out
+
 def compute_fwhm(y: np.ndarray) -> float:
     if y.size == 0: return float("nan")
-    y0 = y - np.min(y)
-    m = np.max(y0)
-    if m <= 0: return float("nan")
-    y0 = y0 / m
-    half = 0.5
-    try:
-        i_left = np.where(y0 >= half)[0][0]
-        i_right = np.where(y0 >= half)[0][-1]
-    except IndexError:
-        return float("nan")
-
-    def interp_x(i1, i2, v1, v2, target):
-        if v2 == v1: return float(i1)
-        return i1 + (target - v1) * (i2 - i1) / (v2 - v1)
-
-    xL = interp_x(i_left-1, i_left, y0[i_left-1] if i_left>0 else y0[i_left], y0[i_left], half)
-    xR = interp_x(i_right, i_right+1 if i_right<len(y0)-1 else i_right, y0[i_right], y0[i_right+1] if i_right<len(y0)-1 else y0[i_right], half)
-    return float(xR - xL)
+    return float(fwhm_pixels(y[None, :])[0])
 
 def resolution_curve(lsf_map: Dict[str, np.ndarray], dispersion_poly: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-    keys = sorted(lsf_map.keys(), key=lambda k: float(k.replace("_dark","")))
-    lambdas = []
-    fwhm_nm = []
-    deriv = np.polyder(dispersion_poly)
-    for k in keys:
-        y = lsf_map[k]
-        pix_fwhm = compute_fwhm(y)
-        peak_pix = _peak_pixel(y)
-        dldx = np.polyval(deriv, peak_pix)
-        lambdas.append(float(k))
-        fwhm_nm.append(float(pix_fwhm * dldx))
-    return np.array(lambdas), np.array(fwhm_nm)
+    sdf, keys = build_sdf(lsf_map)
+    if not keys:
+        return np.empty(0), np.empty(0)
+    # FWHM [nm] = FWHM [px] * local dispersion d(lambda)/dx at the sub-pixel line center
+    dldx = np.polyval(np.polyder(dispersion_poly), peak_centers(sdf))
+    return np.array([float(k) for k in keys]), fwhm_pixels(sdf) * dldx
 
 # Go figures
-def fig_lsf(lsf_map: Dict[str, np.ndarray]) -> go.Figure:
-    fig = go.Figure()
-    for k in sorted(lsf_map.keys(), key=lambda x: float(x)):
-        fig.add_trace(go.Scatter(y=lsf_map[k].tolist(), mode="lines", name=f"{k} nm"))
+def _sorted_keys(lsf_map: Dict[str, np.ndarray]) -> List[str]:
+    return sorted(lsf_map.keys(), key=lambda x: float(x))
+
+def lsf_detail(lsf_map: Dict[str, np.ndarray], point_budget: int = 60_000) -> LineDetail:
+    """Decimation source for fig_lsf: rows in the figure's trace order."""
+    return LineDetail(np.stack([lsf_map[k] for k in _sorted_keys(lsf_map)]), point_budget=point_budget)
+
+def sdf_detail(sdf: np.ndarray, wavelengths: List[str], max_rows: int = 400, max_cols: int = 800) -> HeatmapDetail:
+    return HeatmapDetail(sdf, [float(w) for w in wavelengths], max_rows=max_rows, max_cols=max_cols)
+
+def fig_lsf(lsf_map: Dict[str, np.ndarray], detail: Optional[LineDetail] = None) -> go.Figure:
+    """LSF overlay; with 'detail' (lsf_detail()) every trace is min/max decimated to the point budget."""
+    keys = _sorted_keys(lsf_map)
+    if detail is None:
+        traces = [go.Scatter(y=float32(lsf_map[k]), mode="lines", name=f"{k} nm") for k in keys]
+    else:
+        xs, ys = detail.window()
+        traces = [go.Scatter(x=x.astype(np.int32), y=float32(y), mode="lines", name=f"{k} nm") for k, x, y in zip(keys, xs, ys)]
+    fig = go.Figure(data=traces)
     fig.update_layout(title="LSFs (normalized)", xaxis_title="Pixel", yaxis_title="Norm counts")
     return fig
 
-def fig_sdf(sdf: np.ndarray, wavelengths: List[str]) -> go.Figure:
-    fig = go.Figure(data=go.Heatmap(z=sdf, x=list(range(sdf.shape[1])), y=wavelengths))
+def fig_sdf(sdf: np.ndarray, wavelengths: List[str], detail: Optional[HeatmapDetail] = None) -> go.Figure:
+    """SDF heatmap; with 'detail' (sdf_detail()) binned to screen resolution on a numeric wavelength axis."""
+    if detail is None:
+        fig = go.Figure(data=go.Heatmap(z=float32(sdf), x=np.arange(sdf.shape[1], dtype=np.int32), y=wavelengths))
+    else:
+        x, y, z = detail.window()
+        fig = go.Figure(data=go.Heatmap(z=float32(z), x=float32(x), y=y))
     fig.update_layout(title="SDF Heatmap", xaxis_title="Pixel", yaxis_title="Wavelength (nm)")
     return fig
 
 def fig_resolution(lmbd: np.ndarray, fwhm_nm: np.ndarray) -> go.Figure:
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=lmbd.tolist(), y=fwhm_nm.tolist(), mode="lines+markers", name="Resolution (FWHM)"))
+    fig.add_trace(go.Scatter(x=np.asarray(lmbd, dtype=float), y=float32(fwhm_nm), mode="lines+markers", name="Resolution (FWHM)"))
     fig.update_layout(title="Spectral Resolution", xaxis_title="Wavelength (nm)", yaxis_title="FWHM (nm)")
     return fig
 # API
-def analyze_run(parquet_path: str, wavelengths_to_use: Optional[List[str]]=None, poly_order: int = 3):
-    df = pd.read_parquet(parquet_path)
+# Pipeline stages reported through on_stage(stage, data), in order
+STAGES = ("load", "lsf", "dispersion", "sdf", "fwhm")
+
+StageCallback = Callable[[str, Dict[str, object]], None]
+
+class AnalysisCancelled(Exception):
+    """Raised between stages when the caller's cancelled() returns True."""
+
+def _stage_reporter(on_stage: Optional[StageCallback], cancelled: Optional[Callable[[], bool]]):
+    def stage(name: str, **data):
+        if on_stage: on_stage(name, data)
+        if cancelled and cancelled(): raise AnalysisCancelled(name)
+    return stage
+
+def _compute(parquet_path: str, wavelengths_to_use: Optional[List[str]], poly_order: int,
+             on_stage: Optional[StageCallback] = None, cancelled: Optional[Callable[[], bool]] = None) -> Dict[str, np.ndarray]:
+    """The numeric analysis results as plain arrays (what the cache stores)."""
+    stage = _stage_reporter(on_stage, cancelled)
+    if cancelled and cancelled(): raise AnalysisCancelled("start")
+    labels, block = load_frames(parquet_path, wavelengths_to_use)
     if wavelengths_to_use is None:
-        cand = sorted({w for w in df["Wavelength"].unique() if not str(w).endswith("_dark")},
-                      key=lambda x: float(str(x)))
+        cand = sorted({w for w in labels.tolist() if not w.endswith("_dark")}, key=float)
         wavelengths_to_use = cand
+    stage("load", nframes=int(labels.size))
 
-    lsf_map = build_lsf_map(df, wavelengths_to_use)
+    keys, lsfs = normalized_lsf_block(labels, block, [str(w) for w in wavelengths_to_use])
+    lsf_map = dict(zip(keys, lsfs))
     if not lsf_map:
         raise RuntimeError("No valid LSFs found (check data).")
+    stage("lsf", lsf_map=lsf_map)
 
-    peaks = [int(np.argmax(lsf_map[w])) for w in wavelengths_to_use]
-    lambdas = [float(w) for w in wavelengths_to_use]
+    # Lines without a valid LSF (missing dark, saturated) are left out of the fit
+    peaks = peak_centers(lsfs)
+    lambdas = [float(w) for w in keys]
     poly = fit_dispersion(peaks, lambdas, order=poly_order)
+    stage("dispersion", poly=poly)
 
     sdf, ordered = build_sdf(lsf_map)
+    stage("sdf", sdf=sdf, ordered=ordered)
+
     lam_res, fwhm_nm = resolution_curve(lsf_map, poly)
+    stage("fwhm", lambda_nm=lam_res, fwhm_nm=fwhm_nm)
+    return {"poly": poly, "sdf": sdf, "ordered": np.array(ordered, dtype=str),
+            "lambda_nm": lam_res, "fwhm_nm": fwhm_nm}
 
-    figs = {
-        "lsf": fig_lsf(lsf_map),
-        "sdf": fig_sdf(sdf, ordered),
-        "resolution": fig_resolution(lam_res, fwhm_nm)
-    }
+def _replay_stages(arrays: Dict[str, np.ndarray], on_stage: Optional[StageCallback], cancelled: Optional[Callable[[], bool]]):
+    """Report the stages of a cached result, so callers render the same way as for a fresh one."""
+    stage = _stage_reporter(on_stage, cancelled)
+    ordered = [str(k) for k in arrays["ordered"]]
+    stage("load", nframes=0)
+    stage("lsf", lsf_map=dict(zip(ordered, arrays["sdf"])))
+    stage("dispersion", poly=arrays["poly"])
+    stage("sdf", sdf=arrays["sdf"], ordered=ordered)
+    stage("fwhm", lambda_nm=arrays["lambda_nm"], fwhm_nm=arrays["fwhm_nm"])
+
+def analysis_params(wavelengths_to_use: Optional[List[str]] = None, poly_order: int = 3) -> Dict[str, object]:
+    """Parameters that identify an analysis result (part of the cache key)."""
+    return {"wavelengths": None if wavelengths_to_use is None else [str(w) for w in wavelengths_to_use],
+            "poly_order": int(poly_order)}
+
+def analysis_arrays(parquet_path: str, wavelengths_to_use: Optional[List[str]] = None, poly_order: int = 3,
+                    use_cache: bool = True, on_stage: Optional[StageCallback] = None,
+                    cancelled: Optional[Callable[[], bool]] = None,
+                    digest: Optional[str] = None) -> Tuple[Dict[str, np.ndarray], bool]:
+    """
+    (result arrays, came from cache) for one run; computes and stores them on a cache miss.
+    on_stage(stage, data) is called after each of STAGES with that stage's results; when
+    cancelled() returns True the next stage boundary raises AnalysisCancelled. 'digest' is
+    the parquet's analysis_cache.file_digest when the caller already has it.
+    """
+    params = analysis_params(wavelengths_to_use, poly_order)
+    if use_cache and digest is None:
+        digest = analysis_cache.file_digest(parquet_path)   # once for both lookup and save
+    arrays = analysis_cache.load_result(parquet_path, params, digest) if use_cache else None
+    if arrays is not None:
+        if on_stage or cancelled: _replay_stages(arrays, on_stage, cancelled)
+        return arrays, True
+    arrays = _compute(parquet_path, wavelengths_to_use, poly_order, on_stage, cancelled)
+    if use_cache:
+        try: analysis_cache.save_result(parquet_path, params, arrays, digest)
+        except Exception as e: print(f"Analysis cache save failed: {e}")
+    return arrays, False
+
+class LazyFigures(Mapping):
+    """Read-only figure mapping; each figure is built on first access (fig_lsf alone takes seconds for hundreds of lines)."""
+    def __init__(self, builders: Dict[str, Callable[[], go.Figure]]):
+        self._builders = builders
+        self._figs: Dict[str, go.Figure] = {}
+
+    def __getitem__(self, key: str) -> go.Figure:
+        if key not in self._figs:
+            self._figs[key] = self._builders[key]()
+        return self._figs[key]
+
+    def __iter__(self):
+        return iter(self._builders)
+
+    def __len__(self):
+        return len(self._builders)
+
+def analyze_run(parquet_path: str, wavelengths_to_use: Optional[List[str]]=None, poly_order: int = 3, use_cache: bool = True,
+                on_stage: Optional[StageCallback] = None, cancelled: Optional[Callable[[], bool]] = None):
+    """
+    Analyze one run. Results are cached in a .npz sidecar next to the parquet, keyed by a hash
+    of the parquet content and the parameters; figures are built from the arrays when accessed.
+    """
+    arrays, cached = analysis_arrays(parquet_path, wavelengths_to_use, poly_order, use_cache, on_stage, cancelled)
+    sdf, ordered = arrays["sdf"], [str(k) for k in arrays["ordered"]]
+    lsf_map = dict(zip(ordered, sdf))
+    lam_res, fwhm_nm = arrays["lambda_nm"], arrays["fwhm_nm"]
+    figs = LazyFigures({
+        "lsf": lambda: fig_lsf(lsf_map),
+        "sdf": lambda: fig_sdf(sdf, ordered),
+        "resolution": lambda: fig_resolution(lam_res, fwhm_nm)
+    })
     return {
         "lsf_map": lsf_map,
-        "poly": poly,
+        "poly": arrays["poly"],
         "sdf": sdf,
         "ordered": ordered,
         "resolution": (lam_res, fwhm_nm),
-        "figs": figs
-    }
\ No newline at end of file
+        "figs": figs,
+        "cached": cached
+    }
@@ -0,0 +1,53 @@
+from pathlib import Path
+from typing import Dict, Any, Optional
+import hashlib
+import json
+import os
+import numpy as np
+
+# Bump when the analysis output changes for the same input, so old sidecars are ignored
+CACHE_VERSION = 1
+
+def file_digest(path: Path, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def cache_key(parquet_path: Path, params: Dict[str, Any], digest: Optional[str] = None) -> str:
+    """Hash of the parquet content (its file_digest, if already known) and the analysis parameters."""
+    h = hashlib.sha256()
+    h.update((digest or file_digest(parquet_path)).encode())
+    h.update(json.dumps({"v": CACHE_VERSION, **params}, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+def sidecar_path(parquet_path: Path, key: str) -> Path:
+    """<run>/frames.analysis.<key prefix>.npz, one sidecar per parameter set."""
+    p = Path(parquet_path)
+    return p.with_name(f"{p.stem}.analysis.{key[:16]}.npz")
+
+def load_result(parquet_path: Path, params: Dict[str, Any], digest: Optional[str] = None) -> Optional[Dict[str, np.ndarray]]:
+    """Cached arrays for this parquet content + params, or None."""
+    key = cache_key(Path(parquet_path), params, digest)
+    path = sidecar_path(parquet_path, key)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            if str(z["key"]) != key:
+                return None
+            return {k: z[k] for k in z.files if k != "key"}
+    except Exception as e:
+        print(f"Ignoring unreadable analysis cache {path}: {e}")
+        return None
+
+def save_result(parquet_path: Path, params: Dict[str, Any], arrays: Dict[str, np.ndarray],
+                digest: Optional[str] = None) -> Path:
+    key = cache_key(Path(parquet_path), params, digest)
+    path = sidecar_path(parquet_path, key)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, key=np.array(key), **arrays)
+    os.replace(tmp, path)
+    return path
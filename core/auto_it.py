@@ -1,6 +1,6 @@
 import numpy as np
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Optional, Tuple
 
 @dataclass
 class AutoITParams:
@@ -12,12 +12,26 @@ class AutoITParams:
     step_down_ms: float
     max_adjust_iters: int
     sat_thresh: float
+    strategy: str = "step"          # "step" | "model"
+    sat_backoff: float = 0.3        # IT factor applied on saturation before a bracket exists
 
 class AutoIT:
     def __init__(self, params: AutoITParams):
         self.p = params
+        self.last_iters = 0
 
     def tune(self, read_peak, set_it, start_it_ms: float, on_progress = None) -> Tuple[float, float, bool]:
+        """
+        Adjust the integration time until the peak lands in [target_low, target_high].
+        Returns (it_ms, peak, success); the number of frames used is kept in self.last_iters.
+        """
+        if self.p.strategy == "model":
+            return self._tune_model(read_peak, set_it, start_it_ms, on_progress)
+        if self.p.strategy != "step":
+            raise ValueError(f"Unknown Auto-IT strategy {self.p.strategy}")
+        return self._tune_step(read_peak, set_it, start_it_ms, on_progress)
+
+    def _tune_step(self, read_peak, set_it, start_it_ms: float, on_progress = None) -> Tuple[float, float, bool]:
         it = float(np.clip(start_it_ms, self.p.it_min_ms, self.p.it_max_ms))
         target_mid = 0.5* (self.p.target_low + self.p.target_high)
         peak = np.nan
@@ -32,7 +46,7 @@ class AutoIT:
                 iters += 1
                 if iters > self.p.max_adjust_iters: break
                 continue
-                
+
             if peak >= self.p.sat_thresh:
                 it = max(self.p.it_min_ms, it * 0.7)
                 iters += 1
@@ -55,4 +69,80 @@ class AutoIT:
             iters += 1
             if iters > self.p.max_adjust_iters:
                 break
-        return it, float(peak) if np.isfinite(peak) else float("nan"), success
\ No newline at end of file
+        self.last_iters = iters + 1 if success else iters
+        return it, float(peak) if np.isfinite(peak) else float("nan"), success
+
+    def _tune_model(self, read_peak, set_it, start_it_ms: float, on_progress = None) -> Tuple[float, float, bool]:
+        """
+        Counts grow (nearly) linearly with IT above the dark offset, so jump straight to the IT
+        predicted for the target midpoint: proportional from one point, secant once two
+        unsaturated points exist. Saturated frames only bound the IT from above, and any
+        prediction outside the current bracket falls back to bisection.
+        """
+        p = self.p
+        it = float(np.clip(start_it_ms, p.it_min_ms, p.it_max_ms))
+        target_mid = 0.5 * (p.target_low + p.target_high)
+        peak = np.nan
+        success = False
+        iters = 0
+        lo: Optional[float] = None      # largest IT known to be below target
+        hi: Optional[float] = None      # smallest IT known to be above target (or saturated)
+        prev: Optional[Tuple[float, float]] = None  # (it, signal) of the previous unsaturated frame
+
+        while iters < p.max_adjust_iters:
+            set_it(it)
+            peak, y = read_peak()
+            if on_progress: on_progress(it, peak, iters)
+            iters += 1
+            if not np.isfinite(peak):
+                continue
+
+            if peak >= p.sat_thresh:
+                hi = it if hi is None else min(hi, it)
+                nxt = 0.5 * (lo + hi) if lo is not None else it * p.sat_backoff
+            elif p.target_low <= peak <= p.target_high:
+                success = True
+                break
+            else:
+                offset = _dark_offset(y, peak)
+                signal = peak - offset
+                if peak < p.target_low:
+                    lo = it if lo is None else max(lo, it)
+                else:
+                    hi = it if hi is None else min(hi, it)
+
+                nxt = np.nan
+                if prev is not None and prev[0] != it:
+                    slope = (signal - prev[1]) / (it - prev[0])
+                    if slope > 0:
+                        nxt = it + (target_mid - offset - signal) / slope
+                if not np.isfinite(nxt) and signal > 0:
+                    nxt = it * (target_mid - offset) / signal
+                if not np.isfinite(nxt):
+                    nxt = it * 4.0
+                prev = (it, signal)
+
+                # Keep the prediction strictly inside the known bracket
+                if (lo is not None and nxt <= lo) or (hi is not None and nxt >= hi):
+                    if lo is not None and hi is not None:
+                        nxt = 0.5 * (lo + hi)
+                    elif hi is not None:
+                        nxt = hi * p.sat_backoff
+                    else:
+                        nxt = lo * 4.0
+
+            nxt = float(np.clip(nxt, p.it_min_ms, p.it_max_ms))
+            if nxt == it:
+                break  # pinned at an IT limit, cannot get closer
+            it = nxt
+
+        self.last_iters = iters
+        return it, float(peak) if np.isfinite(peak) else float("nan"), success
+
+def _dark_offset(y, peak: float) -> float:
+    """Baseline estimate (median of the frame) used as the IT-independent offset."""
+    if isinstance(y, np.ndarray) and y.size:
+        off = float(np.median(y))
+        if np.isfinite(off) and off < peak:
+            return off
+    return 0.0
@@ -0,0 +1,97 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from .analysis import analysis_arrays
+from .datalogger import recover_run, run_in_progress
+
+@dataclass
+class RunInfo:
+    run_dir: Path
+    parquet_path: Path
+    serial_number: str
+    timestamp: str      # ISO 8601, from the run directory name
+
+def discover_runs(base_dir: str, recover: bool = False) -> List[RunInfo]:
+    """
+    All run_<SN>_<YYYYmmdd_HHMMSS> directories under base_dir that contain frames.parquet, oldest
+    first. Runs that still have a frames.arrows stream are left unchanged and skipped: still being
+    written, or interrupted. With 'recover', the interrupted ones that are provably dead
+    (datalogger.run_in_progress) are converted to frames.parquet first (datalogger.recover_run).
+    """
+    runs = []
+    unfinished = set()
+    for stream in Path(base_dir).glob("run_*/frames.arrows"):
+        d = stream.parent
+        if run_in_progress(d):
+            print(f"Skipping {d.name}: measurement in progress")
+        elif not recover:
+            print(f"Skipping {d.name}: interrupted run, use --recover or 'spectro recover' to rebuild its parquet")
+        else:
+            try:
+                recover_run(d)
+                continue
+            except Exception as e:
+                print(f"Recovery of {d.name} failed: {e}")
+        unfinished.add(d)
+    for pq_path in Path(base_dir).glob("run_*/frames.parquet"):
+        d = pq_path.parent
+        if d in unfinished:
+            continue
+        parts = d.name[len("run_"):].rsplit("_", 2)
+        sn, ts = (parts[0], f"{parts[1]}_{parts[2]}") if len(parts) == 3 else (d.name[len("run_"):], "")
+        try:
+            with open(d / "run.json", "r", encoding="utf-8") as f:
+                sn = str(json.load(f).get("serial_number", sn))
+        except Exception:
+            pass
+        try:
+            ts = pd.to_datetime(ts, format="%Y%m%d_%H%M%S").isoformat()
+        except (ValueError, TypeError):
+            pass
+        runs.append(RunInfo(d, pq_path, sn, ts))
+    return sorted(runs, key=lambda r: (r.timestamp, str(r.run_dir)))
+
+def _analyze_one(parquet_path: str, poly_order: int, use_cache: bool) -> Tuple[Dict[str, np.ndarray], bool]:
+    # Process pool entry point: hashes the parquet for the cache lookup, and writes the sidecar on a miss
+    return analysis_arrays(parquet_path, None, poly_order, use_cache=use_cache)
+
+def summary_rows(run: RunInfo, arrays: Dict[str, np.ndarray], cached: bool) -> List[Dict[str, object]]:
+    """One row per line: run identity, dispersion coefficients (highest order first) and FWHM."""
+    poly = np.asarray(arrays["poly"], dtype=float)
+    base = {"serial_number": run.serial_number, "timestamp": run.timestamp, "run_dir": str(run.run_dir), "cached": cached}
+    base.update({f"poly_{len(poly) - 1 - i}": float(c) for i, c in enumerate(poly)})
+    return [dict(base, line_nm=float(l), fwhm_nm=float(f)) for l, f in zip(arrays["lambda_nm"], arrays["fwhm_nm"])]
+
+def analyze_batch(base_dir: str, poly_order: int = 3, jobs: Optional[int] = None,
+                  use_cache: bool = True, recover: bool = False) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    Analyze every run under base_dir on a process pool of 'jobs' workers (default: CPU count).
+    Each worker hashes its run's parquet and reads a valid cached result from the sidecar, or
+    analyzes the run. 'recover' is passed to discover_runs. Returns the summary table and the
+    errors per run directory.
+    """
+    runs = discover_runs(base_dir, recover=recover)
+    rows: List[Dict[str, object]] = []
+    errors: Dict[str, str] = {}
+
+    if runs:
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as ex:
+            futs = {ex.submit(_analyze_one, str(r.parquet_path), poly_order, use_cache): r for r in runs}
+            for f in as_completed(futs):
+                r = futs[f]
+                try:
+                    arrays, cached = f.result()
+                    rows.extend(summary_rows(r, arrays, cached))
+                except Exception as e:
+                    errors[str(r.run_dir)] = f"{type(e).__name__}: {e}"
+
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df = df.sort_values(["timestamp", "run_dir", "line_nm"], ignore_index=True)
+    return df, errors
@@ -13,6 +13,13 @@ class SerialConfig:
     baudrate_cube: int = 19200
     baudrate_relay: int = 9600
     timeout_sec: float = 1.0
+    cube_settle_max_s: float = 10.0   # max wait for CUBE emission at the set power
+    # Port autodetection: relay board recognised by USB metadata (description/manufacturer/hwid);
+    # "relay" rarely appears there, set the board's "VID:PID=xxxx:xxxx" (see SciLab.yaml)
+    relay_port_hints: List[str] = field(default_factory=lambda: ["relay"])
+    autodetect_probe_timeout_s: float = 0.3
+    autodetect_port_deadline_s: float = 2.0
+    port_map_path: Optional[str] = None   # remembered port -> device map, defaults to <output.base_dir>/port_map.json
 
 @dataclass
 class AvantesConfig:
@@ -39,15 +46,34 @@ class MeasureConfig:
     step_up_ms: float = 0.3
     step_down_ms: float = 0.1
     max_adjust_iters: int = 300
+    autoit_strategy: str = "step"   # "step" (fixed IT steps) | "model" (proportional/secant jump)
+    use_it_cache: bool = True       # seed Auto-IT from the last converged IT of the same laser
+    it_cache_max_age_h: float = 168.0
     sat_thresh: float = 65535.0
     n_sig: int = 50
     n_dark: int = 50
+    raw_capture: bool = False       # also keep every SIG/DARK cycle (uint16 .npy ring) plus rcs/rcl
+    raw_capture_max_ncy: int = 1000
+    pipeline: bool = False          # prepare the next laser while the current dark is measured
+    reuse_darks: bool = False       # use the dark library (reuse/interpolate darks across lasers and runs)
+    dark_it_tol_ms: float = 0.1     # ITs closer than this share a dark (one Auto-IT step_down_ms)
+    dark_temp_tol_c: float = 0.5    # max detector temperature difference for reuse
+    dark_max_age_h: float = 24.0
+    dark_interpolate: bool = False  # else interpolate between the nearest stored ITs (opt-in)
+    dark_max_interp_span_ms: float = 50.0
     n_sig_640: int = 10
     n_dark_640: int = 10
 
 @dataclass
 class OutputConfig:
     base_dir: str = "./runs"
+    it_cache_path: Optional[str] = None  # defaults to <base_dir>/it_cache.json
+    write_csv: bool = True               # frames.csv alongside frames.parquet (not needed for crash recovery)
+    dark_cache_dir: Optional[str] = None # global dark library shared between runs (run dir is always used)
+
+@dataclass
+class UIConfig:
+    live_max_fps: float = 30.0   # live view refresh limit; faster frames are dropped (latest wins)
 
 @dataclass
 class AppConfig:
@@ -56,6 +82,7 @@ class AppConfig:
     lasers: List[LaserSpec] = field(default_factory=list)
     measure: MeasureConfig = field(default_factory=MeasureConfig)
     output: OutputConfig = field(default_factory=OutputConfig)
+    ui: UIConfig = field(default_factory=UIConfig)
 
 DEFAULT_CONFIG = AppConfig(
     lasers=[
@@ -87,8 +114,9 @@ def _from_dict(d: Dict[str, Any]) -> AppConfig:
     avantes = AvantesConfig(**d.get("avantes", {}))
     measure = MeasureConfig(**d.get("measure", {}))
     output  = OutputConfig(**d.get("output", {}))
+    ui      = UIConfig(**d.get("ui", {}))
     lasers  = [LaserSpec(**ld) for ld in d.get("lasers", [])]
-    return AppConfig(serial=serial, avantes=avantes, lasers=lasers, measure=measure, output=output)
+    return AppConfig(serial=serial, avantes=avantes, lasers=lasers, measure=measure, output=output, ui=ui)
 
 def _to_dict(cfg: AppConfig) -> Dict[str, Any]:
     return {
@@ -96,5 +124,6 @@ def _to_dict(cfg: AppConfig) -> Dict[str, Any]:
         "avantes": vars(cfg.avantes),
         "measure": vars(cfg.measure),
         "output":  vars(cfg.output),
+        "ui":      vars(cfg.ui),
         "lasers": [vars(l) for l in cfg.lasers],
     }
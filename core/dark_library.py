@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+import time
+import numpy as np
+
+@dataclass
+class DarkEntry:
+    sn: str
+    it_ms: float
+    temp_c: float
+    rcm: np.ndarray
+    rcs: np.ndarray
+    ncy: int
+    created: float      # unix time
+    path: Optional[Path] = None
+
+@dataclass
+class DarkMatch:
+    rcm: np.ndarray
+    rcs: np.ndarray
+    source: str         # "reuse:<file>" or "interp:<file>+<file>"
+
+class DarkLibrary:
+    """
+    Dark means (and rcs) keyed by spectrometer SN, integration time and detector temperature.
+    Entries are .npz files in one or more directories (the run directory first, then an
+    optional global cache); new darks are written to all of them.
+
+    lookup() returns a stored dark whose IT is within it_tol_ms, otherwise (if allowed) a
+    linear interpolation between the nearest stored ITs below and above. Only entries of
+    the same SN, within temp_tol_c and younger than max_age_h are used. When the detector
+    temperature is unknown (NaN, now or when the entry was stored), only darks taken since
+    this library was opened, i.e. in the current run, can be matched by SN and IT.
+    """
+    def __init__(self, dirs: List[Path], it_tol_ms: float = 0.1, temp_tol_c: float = 0.5,
+                 max_age_h: float = 24.0, interpolate: bool = False, max_interp_span_ms: float = 50.0):
+        self.dirs = [Path(d) for d in dirs]
+        self.it_tol_ms = float(it_tol_ms)
+        self.temp_tol_c = float(temp_tol_c)
+        self.max_age_h = float(max_age_h)
+        self.interpolate = interpolate
+        self.max_interp_span_ms = float(max_interp_span_ms)
+        self.entries: List[DarkEntry] = []
+        self.opened = time.time()
+        for d in self.dirs:
+            self._scan(d)
+
+    def _scan(self, d: Path):
+        if not d.exists():
+            return
+        known = {e.path.name for e in self.entries if e.path is not None}
+        for f in sorted(d.glob("dark_*.npz")):
+            if f.name in known:
+                continue
+            try:
+                with np.load(f) as z:
+                    self.entries.append(DarkEntry(
+                        sn=str(z["sn"]), it_ms=float(z["it_ms"]), temp_c=float(z["temp_c"]),
+                        rcm=z["rcm"], rcs=z["rcs"], ncy=int(z["ncy"]), created=float(z["created"]), path=f))
+            except Exception as e:
+                print(f"Skipping unreadable dark {f}: {e}")
+
+    def _usable(self, sn: str, temp_c: float, npix: Optional[int]) -> List[DarkEntry]:
+        now = time.time()
+        out = []
+        for e in self.entries:
+            if e.sn != sn: continue
+            if npix is not None and e.rcm.size != npix: continue
+            if self.max_age_h > 0 and now - e.created > self.max_age_h * 3600.0: continue
+            if np.isfinite(temp_c) and np.isfinite(e.temp_c):
+                if abs(e.temp_c - temp_c) > self.temp_tol_c: continue
+            elif e.created < self.opened:
+                continue    # no temperature to compare: same run only
+            out.append(e)
+        return out
+
+    def lookup(self, sn: str, it_ms: float, temp_c: float, npix: Optional[int] = None) -> Optional[DarkMatch]:
+        cands = self._usable(sn, temp_c, npix)
+        if not cands:
+            return None
+        best = min(cands, key=lambda e: (abs(e.it_ms - it_ms), _temp_diff(e.temp_c, temp_c)))
+        if abs(best.it_ms - it_ms) <= self.it_tol_ms:
+            return DarkMatch(best.rcm, best.rcs, f"reuse:{_name(best)}")
+        if not self.interpolate:
+            return None
+        below = [e for e in cands if e.it_ms < it_ms]
+        above = [e for e in cands if e.it_ms > it_ms]
+        if not below or not above:
+            return None
+        lo = max(below, key=lambda e: e.it_ms)
+        hi = min(above, key=lambda e: e.it_ms)
+        if hi.it_ms - lo.it_ms > self.max_interp_span_ms:
+            return None
+        # Dark counts are offset + dark current * IT: linear in IT between the neighbours
+        w = (it_ms - lo.it_ms) / (hi.it_ms - lo.it_ms)
+        rcm = (1.0 - w) * lo.rcm + w * hi.rcm
+        rcs = (1.0 - w) * lo.rcs + w * hi.rcs if lo.rcs.shape == hi.rcs.shape == rcm.shape else np.array([])
+        return DarkMatch(rcm, rcs, f"interp:{_name(lo)}+{_name(hi)}")
+
+    def add(self, sn: str, it_ms: float, temp_c: float, rcm: np.ndarray, rcs: np.ndarray, ncy: int) -> DarkEntry:
+        created = time.time()
+        e = DarkEntry(sn=sn, it_ms=float(it_ms), temp_c=float(temp_c), rcm=np.asarray(rcm, dtype=float),
+                      rcs=np.asarray(rcs, dtype=float), ncy=int(ncy), created=created)
+        name = f"dark_{sn}_{it_ms:.4f}ms_{temp_c:+.1f}C_{time.strftime('%Y%m%d_%H%M%S', time.localtime(created))}_{int(created * 1000) % 1000:03d}.npz"
+        for d in self.dirs:
+            try:
+                d.mkdir(parents=True, exist_ok=True)
+                np.savez(d / name, sn=sn, it_ms=e.it_ms, temp_c=e.temp_c, rcm=e.rcm, rcs=e.rcs, ncy=e.ncy, created=created)
+                if e.path is None:
+                    e.path = d / name
+            except Exception as ex:
+                print(f"Could not store dark in {d}: {ex}")
+        self.entries.append(e)
+        return e
+
+def _temp_diff(a: float, b: float) -> float:
+    d = abs(a - b)
+    return d if np.isfinite(d) else np.inf
+
+def _name(e: DarkEntry) -> str:
+    return e.path.name if e.path is not None else f"{e.it_ms:.4f}ms"
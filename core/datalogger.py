@@ -1,9 +1,14 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Optional, Sequence, Union
 import json
+import os
 import time
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .frame_buffer import FrameBuffer
 
 @dataclass
 class RunPaths:
@@ -11,6 +16,8 @@ class RunPaths:
     csv_path: Path
     parquet_path: Path
     meta_path: Path
+    stream_path: Path   # frames.arrows while the run is being written
+    lock_path: Path     # frames.lock, held by the DataLogger writing the run
 
 def prepare_run_dir(base_dir: str, device_sn: str) -> RunPaths:
     ts = time.strftime("%Y%m%d_%H%M%S")
@@ -20,41 +27,201 @@ def prepare_run_dir(base_dir: str, device_sn: str) -> RunPaths:
         root= root,
         csv_path= root / "frames.csv",
         parquet_path=root / "frames.parquet",
-        meta_path=root / "run.json"
+        meta_path=root / "run.json",
+        stream_path=root / "frames.arrows",
+        lock_path=root / "frames.lock"
     )
 
+META_COLUMNS = ["Timestamp", "LaserID", "CycleType", "CycleIDX", "IntegrationMS"]
+SPECTRUM_COLUMN = "Spectrum"
+
+def frame_schema(npix: int, dtype = np.float64) -> pa.Schema:
+    """Fixed frames.parquet schema: one row per frame, the spectrum as a fixed-size list column."""
+    return pa.schema([
+        ("Timestamp", pa.string()),
+        ("LaserID", pa.string()),
+        ("CycleType", pa.string()),
+        ("CycleIDX", pa.int32()),
+        ("IntegrationMS", pa.float64()),
+        (SPECTRUM_COLUMN, pa.list_(pa.from_numpy_dtype(np.dtype(dtype)), int(npix))),
+    ])
+
+def _try_lock(f) -> bool:
+    """Non-blocking exclusive OS lock on an open file; released when the file is closed."""
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def _lock_held(lock_path: Path) -> bool:
+    try:
+        f = open(lock_path, "r+")
+    except FileNotFoundError:
+        return False
+    with f:
+        return not _try_lock(f)
+
+def run_in_progress(run_dir: Union[str, Path], stale_s: float = 600.0) -> bool:
+    """
+    True unless the run is provably finished or dead: its frames.lock is not held, and it
+    either wrote wall_time_s to run.json or its frames.arrows has not been written to for
+    'stale_s' seconds.
+    """
+    d = Path(run_dir)
+    if _lock_held(d / "frames.lock"):
+        return True
+    try:
+        with open(d / "run.json", "r", encoding="utf-8") as f:
+            if "wall_time_s" in json.load(f):
+                return False
+    except Exception:
+        pass
+    try:
+        return time.time() - (d / "frames.arrows").stat().st_mtime < stale_s
+    except FileNotFoundError:
+        return False
+
+def finalize_stream(stream_path: Path, parquet_path: Path) -> int:
+    """
+    Convert a frames.arrows stream to frames.parquet, one row group per record batch (i.e. per
+    flush). A truncated last batch (crash during a write) is dropped. Removes the stream and
+    returns the number of frames written; a stream that is already gone leaves an existing
+    frames.parquet as it is.
+    """
+    if not Path(stream_path).exists():
+        return pq.ParquetFile(str(parquet_path)).metadata.num_rows if Path(parquet_path).exists() else 0
+    n = 0
+    with pa.OSFile(str(stream_path), "rb") as src:
+        try:
+            reader = pa.ipc.open_stream(src)
+        except (pa.ArrowInvalid, OSError):
+            reader = None   # crashed before the first flush completed
+        if reader is not None:
+            tmp = Path(parquet_path).with_suffix(".parquet.tmp")
+            with pq.ParquetWriter(str(tmp), reader.schema) as w:
+                while True:
+                    try:
+                        batch = reader.read_next_batch()
+                    except (StopIteration, pa.ArrowInvalid, OSError):
+                        break
+                    w.write_batch(batch)
+                    n += batch.num_rows
+            tmp.replace(parquet_path)
+    Path(stream_path).unlink(missing_ok=True)
+    return n
+
+def recover_run(run_dir: Union[str, Path]) -> Optional[Path]:
+    """
+    frames.parquet of a run directory, rebuilt from frames.arrows first if the run did not
+    close its logger (crash, power loss). None if the run has no frames. Raises RuntimeError
+    while a DataLogger still holds the run's lock.
+    """
+    d = Path(run_dir)
+    stream, parquet = d / "frames.arrows", d / "frames.parquet"
+    if stream.exists():
+        if _lock_held(d / "frames.lock"):
+            raise RuntimeError(f"{d.name} is still being written")
+        n = finalize_stream(stream, parquet)
+        (d / "frames.lock").unlink(missing_ok=True)
+        print(f"Recovered {n} frames of {d.name} from {stream.name}")
+    return parquet if parquet.exists() else None
+
 class DataLogger:
-    def __init__(self, paths: RunPaths):
+    """
+    Append-only frame logger. Frames are buffered in a FrameBuffer and every flush() appends
+    them as one record batch to an Arrow IPC stream (frames.arrows), and to frames.csv when
+    enabled, so flush cost only depends on the new frames. Unlike a parquet file, whose footer
+    is only written on close, the stream stays readable up to the last complete flush if the
+    process dies. close() converts it to frames.parquet (one row group per flush); after a
+    crash, recover_run() does the same. frames.csv is therefore not needed for recovery.
+    From construction to close() the logger holds frames.lock, which marks the run as in
+    progress (run_in_progress) so recovery leaves its stream alone.
+
+    Spectra are stored as float64 so runs stay comparable with earlier ones; dtype=np.float32
+    (or np.uint16 for raw counts) halves the file size where that precision is enough.
+    """
+    def __init__(self, paths: RunPaths, write_csv: bool = True, dtype = np.float64):
         self.paths = paths
-        self.rows: List[Dict[str, Any]] = []
-    
+        self.write_csv = write_csv
+        self.buffer = FrameBuffer(dtype=dtype)
+        self._sink: Optional[pa.OSFile] = None
+        self._writer: Optional[pa.ipc.RecordBatchStreamWriter] = None
+        self._lock = open(paths.lock_path, "w")
+        if not _try_lock(self._lock):
+            self._lock.close()
+            raise RuntimeError(f"{paths.root.name} is already being written")
+
+    @property
+    def npix(self) -> Optional[int]:
+        return self.buffer.npix
+
     def log_meta(self, meta: Dict[str,Any]):
         with open(self.paths.meta_path, "w", encoding="utf-8") as f:
             json.dump(meta, f, indent=2)
 
-    def add_frame(self, timestamp: str, laser_id: str, cycle_type: str, cycle_idx: int, integration_ms: float, pixels: List[float]):
-        row: Dict[str, Any] = {
-            "Timestamp": timestamp,
-            "LaserID": laser_id,
-            "CycleType": cycle_type,
-            "CycleIDX": cycle_idx,
-            "IntegrationMS": integration_ms
-        }
-        for i, val in enumerate(pixels):
-            row[f"Pixel_{i}"] = float(val)
-        self.rows.append(row)
+    def add_frame(self, timestamp: str, laser_id: str, cycle_type: str, cycle_idx: int, integration_ms: float, pixels: Union[np.ndarray, Sequence[float]]):
+        self.buffer.append(timestamp, laser_id, cycle_type, cycle_idx, integration_ms, pixels)
+
+    def _table(self) -> pa.Table:
+        b = self.buffer
+        schema = frame_schema(b.npix, b.dtype)
+        cols = [
+            pa.array(b.timestamp_list(), type=pa.string()),
+            pa.array(b.laser_id_list(), type=pa.string()),
+            pa.array(b.cycle_type_list(), type=pa.string()),
+            pa.array(b.cycle_idx[:b.n]),
+            pa.array(b.integration_ms[:b.n]),
+            pa.FixedSizeListArray.from_arrays(pa.array(b.spectra_view().ravel()), b.npix),
+        ]
+        return pa.Table.from_arrays(cols, schema=schema)
+
+    def _append_csv(self):
+        b = self.buffer
+        new = not self.paths.csv_path.exists()
+        with open(self.paths.csv_path, "a", encoding="utf-8", newline="") as f:
+            if new:
+                f.write(",".join(META_COLUMNS + [f"Pixel_{i}" for i in range(b.npix)]) + "\n")
+            meta = zip(b.timestamp_list(), b.laser_id_list(), b.cycle_type_list(), b.cycle_idx[:b.n], b.integration_ms[:b.n])
+            for m, spec in zip(meta, b.spectra_view()):
+                f.write(",".join(map(str, m)) + "," + ",".join(map(str, spec.tolist())) + "\n")
 
     def flush(self):
-        if not self.rows:
+        if not len(self.buffer):
             return
-        df = pd.DataFrame(self.rows)
-        if self.paths.csv_path.exists():
-            df.to_csv(self.paths.csv_path, mode = 'a', header=False, index=False)
-        else:
-            df.to_csv(self.paths.csv_path, index=False)
-        if self.paths.parquet_path.exists():
-            old = pd.read_parquet(self.paths.parquet_path)
-            pd.concat([old,df], ignore_index=True).to_parquet(self.paths.parquet_path, index=False)
-        else:
-            df.to_parquet(self.paths.parquet_path, index=False)
-        self.rows.clear()
\ No newline at end of file
+        if self.write_csv:
+            self._append_csv()
+        if self._writer is None:
+            self._sink = pa.OSFile(str(self.paths.stream_path), "wb")
+            self._writer = pa.ipc.new_stream(self._sink, frame_schema(self.buffer.npix, self.buffer.dtype))
+        self._writer.write_table(self._table())
+        self._sink.flush()
+        self.buffer.clear()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            try:
+                if self._writer is not None:
+                    self._writer.close()
+                    self._sink.close()
+                    self._writer = self._sink = None
+                    finalize_stream(self.paths.stream_path, self.paths.parquet_path)
+            finally:
+                if self._lock is not None:
+                    self._lock.close()
+                    self._lock = None
+                    self.paths.lock_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
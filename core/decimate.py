@@ -0,0 +1,117 @@
+from typing import Optional, Sequence, Tuple, Dict, List
+import numpy as np
+
+from .plot_data import typed_array
+
+def _edge_pad(a: np.ndarray, axis: int, size: int) -> np.ndarray:
+    """Pad 'a' along 'axis' to 'size' by repeating the last element (leaves min/max of a bin unchanged)."""
+    extra = size - a.shape[axis]
+    if extra <= 0:
+        return a
+    pad = [(0, 0)] * a.ndim
+    pad[axis] = (0, extra)
+    return np.pad(a, pad, mode="edge")
+
+def minmax_decimate(y: np.ndarray, n_bins: int, start: int = 0, stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Min/max decimation of y[..., start:stop] (one row or a (n, npix) stack) into n_bins bins.
+    Every bin keeps its minimum and maximum sample in original order, so peaks and dips
+    survive at any zoom. Returns (x, y_dec) with x the original sample indices; both have
+    the shape of y with the last axis reduced to 2 * n_bins (x is per row for stacks).
+    Ranges that already fit are returned unchanged.
+    """
+    y = np.asarray(y)
+    npix = y.shape[-1]
+    start = max(0, int(start))
+    stop = npix if stop is None else min(npix, int(stop))
+    seg = y[..., start:stop]
+    n = seg.shape[-1]
+    if n <= 2 * n_bins or n_bins < 1:
+        x = np.broadcast_to(np.arange(start, stop), seg.shape).copy()
+        return x, seg.copy()
+    b = -(-n // n_bins)                         # samples per bin
+    nb = -(-n // b)
+    blocks = _edge_pad(seg, -1, nb * b).reshape(seg.shape[:-1] + (nb, b))
+    imin = blocks.argmin(axis=-1)
+    imax = blocks.argmax(axis=-1)
+    first, second = np.minimum(imin, imax), np.maximum(imin, imax)
+    offs = np.arange(nb) * b
+    idx = np.stack([first + offs, second + offs], axis=-1).reshape(seg.shape[:-1] + (2 * nb,))
+    idx = np.minimum(idx, n - 1)
+    return idx + start, np.take_along_axis(seg, idx, axis=-1)
+
+def bin_max(z: np.ndarray, max_rows: int, max_cols: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reduce a 2-D array to at most (max_rows, max_cols) cells by taking the maximum of each
+    block (narrow lines stay visible). Returns (row_start, col_start, z_binned): the first
+    row/column index of every block and the binned values.
+    """
+    z = np.asarray(z)
+    nr, nc = z.shape
+    br = max(1, -(-nr // max(1, max_rows)))
+    bc = max(1, -(-nc // max(1, max_cols)))
+    if br == 1 and bc == 1:
+        return np.arange(nr), np.arange(nc), z
+    mr, mc = -(-nr // br), -(-nc // bc)
+    zp = _edge_pad(_edge_pad(z, 0, mr * br), 1, mc * bc)
+    zb = zp.reshape(mr, br, mc, bc).max(axis=(1, 3))
+    return np.arange(mr) * br, np.arange(mc) * bc, zb
+
+class LineDetail:
+    """
+    Full-resolution rows of a line overlay plus decimation for a visible pixel range, so a
+    plot can start coarse and re-fetch detail when zoomed. point_budget caps the points of
+    all traces together; each trace gets at least min_bins bins.
+    """
+    def __init__(self, rows: np.ndarray, point_budget: int = 60_000, min_bins: int = 64):
+        self.rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        self.n_bins = max(min_bins, point_budget // max(1, 2 * self.rows.shape[0]))
+
+    def window(self, x0: Optional[float] = None, x1: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        npix = self.rows.shape[1]
+        start = 0 if x0 is None else max(0, int(np.floor(x0)) - 1)
+        stop = npix if x1 is None else min(npix, int(np.ceil(x1)) + 2)
+        if stop <= start:
+            start, stop = 0, npix
+        return minmax_decimate(self.rows, self.n_bins, start, stop)
+
+class HeatmapDetail:
+    """Full-resolution heatmap (rows at numeric y values, ascending) binned to max_rows x max_cols for a visible range."""
+    def __init__(self, z: np.ndarray, y_values: Sequence[float], max_rows: int = 400, max_cols: int = 800):
+        self.z = np.asarray(z, dtype=float)
+        self.y = np.asarray(y_values, dtype=float)
+        self.max_rows, self.max_cols = max_rows, max_cols
+
+    def window(self, x0: Optional[float] = None, x1: Optional[float] = None,
+               y0: Optional[float] = None, y1: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(x pixel centers, y values, z) of the binned cells covering the requested range."""
+        nr, nc = self.z.shape
+        c0 = 0 if x0 is None else max(0, int(np.floor(x0)))
+        c1 = nc if x1 is None else min(nc, int(np.ceil(x1)) + 1)
+        r0 = 0 if y0 is None else int(np.searchsorted(self.y, y0, side="left"))
+        r1 = nr if y1 is None else int(np.searchsorted(self.y, y1, side="right"))
+        r0, r1 = max(0, r0 - 1), min(nr, r1 + 1)
+        if c1 <= c0: c0, c1 = 0, nc
+        if r1 <= r0: r0, r1 = 0, nr
+        rs, cs, zb = bin_max(self.z[r0:r1, c0:c1], self.max_rows, self.max_cols)
+        # Cell centers: column = mean pixel of the block, row = mean y value of the block
+        bc = cs[1] - cs[0] if cs.size > 1 else 1
+        x = c0 + cs + (bc - 1) / 2.0
+        yv = self.y[r0:r1]
+        y = np.array([yv[s:e].mean() for s, e in zip(rs, list(rs[1:]) + [yv.size])])
+        return x, y, zb
+
+def detail_update(source, req: Dict[str, Optional[List[float]]]) -> Dict[str, object]:
+    """
+    Plotly.restyle payload for a zoom request {"x": [x0, x1] | None, "y": [y0, y1] | None}
+    (None: full range) on a LineDetail or HeatmapDetail. Arrays are typed_array() specs.
+    """
+    xr, yr = req.get("x"), req.get("y")
+    x0, x1 = sorted(xr) if xr else (None, None)
+    if isinstance(source, LineDetail):
+        x, y = source.window(x0, x1)
+        return {"update": {"x": [typed_array(r, np.int32) for r in x], "y": [typed_array(r) for r in y]},
+                "traces": list(range(y.shape[0]))}
+    y0, y1 = sorted(yr) if yr else (None, None)
+    x, y, z = source.window(x0, x1, y0, y1)
+    return {"update": {"x": [typed_array(x)], "y": [typed_array(y, np.float64)], "z": [typed_array(z)]}, "traces": [0]}
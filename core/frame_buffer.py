@@ -0,0 +1,99 @@
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+
+CYCLE_TYPES = ["SIG", "DARK"]
+
+class FrameBuffer:
+    """
+    Growable frame store: spectra live in one preallocated (capacity, npix) block and the
+    per-frame metadata in small parallel arrays. Laser ids and cycle types are stored as
+    integer codes into the laser_ids / CYCLE_TYPES tables.
+    """
+    def __init__(self, npix: Optional[int] = None, dtype = np.float64, capacity: int = 16):
+        self.dtype = np.dtype(dtype)
+        self.npix = npix
+        self.capacity = max(1, int(capacity))
+        self.n = 0
+        self.laser_ids: List[str] = []
+        self._laser_codes: Dict[str, int] = {}
+        self.spectra = np.empty((0, 0), dtype=self.dtype)
+        self.timestamp = np.empty(0, dtype="datetime64[s]")
+        self.laser_code = np.empty(0, dtype=np.int16)
+        self.cycle_type = np.empty(0, dtype=np.int8)
+        self.cycle_idx = np.empty(0, dtype=np.int32)
+        self.integration_ms = np.empty(0, dtype=np.float64)
+        if npix is not None:
+            self._allocate(int(npix), self.capacity)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _allocate(self, npix: int, capacity: int):
+        self.npix = npix
+        self.capacity = capacity
+        self.spectra = np.empty((capacity, npix), dtype=self.dtype)
+        self.timestamp = np.empty(capacity, dtype="datetime64[s]")
+        self.laser_code = np.empty(capacity, dtype=np.int16)
+        self.cycle_type = np.empty(capacity, dtype=np.int8)
+        self.cycle_idx = np.empty(capacity, dtype=np.int32)
+        self.integration_ms = np.empty(capacity, dtype=np.float64)
+
+    def _grow(self):
+        cap = self.capacity * 2
+        for name in ("spectra", "timestamp", "laser_code", "cycle_type", "cycle_idx", "integration_ms"):
+            old = getattr(self, name)
+            new = np.empty((cap,) + old.shape[1:], dtype=old.dtype)
+            new[:self.n] = old[:self.n]
+            setattr(self, name, new)
+        self.capacity = cap
+
+    def _code(self, laser_id: str) -> int:
+        code = self._laser_codes.get(laser_id)
+        if code is None:
+            code = len(self.laser_ids)
+            self.laser_ids.append(laser_id)
+            self._laser_codes[laser_id] = code
+        return code
+
+    def append(self, timestamp: str, laser_id: str, cycle_type: str, cycle_idx: int, integration_ms: float, pixels: Union[np.ndarray, Sequence[float]]):
+        spec = np.asarray(pixels).ravel()
+        if self.npix is None:
+            self._allocate(int(spec.size), self.capacity)
+        elif spec.size != self.npix:
+            raise ValueError(f"Frame has {spec.size} pixels, buffer holds {self.npix}")
+        if cycle_type not in CYCLE_TYPES:
+            raise ValueError(f"Unknown cycle type {cycle_type}")
+        if self.n == self.capacity:
+            self._grow()
+        i = self.n
+        if np.issubdtype(self.dtype, np.integer):
+            info = np.iinfo(self.dtype)
+            np.clip(np.rint(spec), info.min, info.max, out=self.spectra[i], casting="unsafe")
+        else:
+            self.spectra[i] = spec
+        self.timestamp[i] = np.datetime64(timestamp, "s")
+        self.laser_code[i] = self._code(laser_id)
+        self.cycle_type[i] = CYCLE_TYPES.index(cycle_type)
+        self.cycle_idx[i] = cycle_idx
+        self.integration_ms[i] = integration_ms
+        self.n += 1
+
+    def clear(self):
+        """Drop the frames but keep the allocated block (and the laser id table) for reuse."""
+        self.n = 0
+
+    # Views over the filled part of the buffer
+    def spectra_view(self) -> np.ndarray:
+        return self.spectra[:self.n]
+
+    def laser_id_list(self) -> List[str]:
+        return [self.laser_ids[c] for c in self.laser_code[:self.n]]
+
+    def cycle_type_list(self) -> List[str]:
+        return [CYCLE_TYPES[c] for c in self.cycle_type[:self.n]]
+
+    def timestamp_list(self) -> List[str]:
+        return list(np.datetime_as_string(self.timestamp[:self.n], unit="s"))
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, a).nbytes for a in ("spectra", "timestamp", "laser_code", "cycle_type", "cycle_idx", "integration_ms"))
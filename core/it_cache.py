@@ -0,0 +1,71 @@
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Optional
+import json
+import time
+
+from .config import LaserSpec
+
+@dataclass
+class ITCacheEntry:
+    it_ms: float
+    peak: float
+    updated: float      # unix time of the run that produced the entry
+
+def laser_power_key(ls: LaserSpec) -> str:
+    if ls.type == "OBIS" and ls.power_w is not None:
+        return f"{float(ls.power_w):g}W"
+    if ls.type == "CUBE" and ls.power_mw is not None:
+        return f"{float(ls.power_mw):g}mW"
+    return "-"
+
+class ITCache:
+    """
+    On-disk map (spectrometer SN, laser id, laser power) -> last converged integration time.
+    Entries older than max_age_h, or outside the configured IT limits, are ignored.
+    """
+    def __init__(self, path: Path, max_age_h: float = 168.0):
+        self.path = Path(path)
+        self.max_age_h = float(max_age_h)
+        self.entries: Dict[str, ITCacheEntry] = {}
+        self.load()
+
+    @staticmethod
+    def key(serial_number: str, ls: LaserSpec) -> str:
+        return f"{serial_number}|{ls.id}|{laser_power_key(ls)}"
+
+    def load(self):
+        self.entries.clear()
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f) or {}
+            for k, v in raw.items():
+                self.entries[k] = ITCacheEntry(**v)
+        except Exception as e:
+            print(f"IT cache {self.path} unreadable ({e}); starting empty.")
+            self.entries.clear()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: asdict(v) for k, v in self.entries.items()}, f, indent=2)
+        tmp.replace(self.path)
+
+    def lookup(self, serial_number: str, ls: LaserSpec, it_min_ms: float, it_max_ms: float) -> Optional[ITCacheEntry]:
+        e = self.entries.get(self.key(serial_number, ls))
+        if e is None:
+            return None
+        if self.max_age_h > 0 and (time.time() - e.updated) > self.max_age_h * 3600.0:
+            return None
+        if not (it_min_ms <= e.it_ms <= it_max_ms):
+            return None
+        return e
+
+    def store(self, serial_number: str, ls: LaserSpec, it_ms: float, peak: float):
+        self.entries[self.key(serial_number, ls)] = ITCacheEntry(it_ms=float(it_ms), peak=float(peak), updated=time.time())
+
+    def invalidate(self, serial_number: str, ls: LaserSpec):
+        self.entries.pop(self.key(serial_number, ls), None)
@@ -1,11 +1,17 @@
 from dataclasses import dataclass
-from typing import Callable, Optional, Dict
+from typing import Callable, Optional, Dict, List, Set
+from concurrent.futures import ThreadPoolExecutor, Future
 from datetime import datetime
+from pathlib import Path
+import time
 import numpy as np
 
 from .config import AppConfig, LaserSpec
 from .auto_it import AutoIT, AutoITParams
 from .datalogger import DataLogger, prepare_run_dir
+from .it_cache import ITCache
+from .raw_capture import raw_capture_paths, save_cycle_stats
+from .dark_library import DarkLibrary
 from ..drivers.avantes_controller import AvantesController
 from ..drivers.obis_controller import ObisController
 from ..drivers.cube_controller import CubeController
@@ -15,17 +21,26 @@ from ..drivers.relay_controller import RelayController
 class MeasurementResult:
     run_dir: str
     success_map: Dict[str, bool]
+    wall_time_s: float = float("nan")
 
 class MeasurementRunner:
-    def __init__(self, cfg: AppConfig):
+    def __init__(self, cfg: AppConfig, sim_spectrometer: Optional[object] = None):
+        """sim_spectrometer: simulated spectrometer driver (drivers.sim_rig.SimSpectrometer) to run against."""
         self.cfg = cfg
         self.spec = AvantesController(
             dll_path=self.cfg.avantes.dll_path,
-            simulate=self.cfg.avantes.simulate
+            simulate=self.cfg.avantes.simulate,
+            raw_capture_max_ncy=self.cfg.measure.raw_capture_max_ncy,
+            sim_device=sim_spectrometer
         )
         self.obis: Optional[ObisController] = None
         self.cube: Optional[CubeController] = None
         self.relay: Optional[RelayController] = None
+        # One single-thread worker per laser device: commands to a device stay ordered,
+        # different devices may work concurrently.
+        self._workers: Dict[str, ThreadPoolExecutor] = {}
+        # OBIS lasers whose power was already set by the batched _obis_setup()
+        self._obis_powered: Set[str] = set()
 
     def _connect_devices(self):
         self.spec.connect()
@@ -33,7 +48,8 @@ class MeasurementRunner:
             self.obis = ObisController(self.cfg.serial.obis_port, self.cfg.serial.baudrate_obis, self.cfg.serial.timeout_sec)
             self.obis.connect()
         if self.cfg.serial.cube_port:
-            self.cube = CubeController(self.cfg.serial.cube_port, self.cfg.serial.baudrate_cube, self.cfg.serial.timeout_sec)
+            self.cube = CubeController(self.cfg.serial.cube_port, self.cfg.serial.baudrate_cube, self.cfg.serial.timeout_sec,
+                                       settle_max_s=self.cfg.serial.cube_settle_max_s)
             self.cube.connect()
         if self.cfg.serial.relay_port:
             self.relay = RelayController(self.cfg.serial.relay_port, self.cfg.serial.baudrate_relay, self.cfg.serial.timeout_sec)
@@ -47,21 +63,58 @@ class MeasurementRunner:
                 if dev: dev.close()
             except: pass
 
-    def _laser_on(self, ls: LaserSpec):
+    def _obis_lasers(self) -> List[LaserSpec]:
+        return [l for l in self.cfg.lasers if l.enabled and l.type == "OBIS" and l.channel is not None]
+
+    def _obis_setup(self):
+        """
+        Power levels of all enabled OBIS lasers, then all their channels off, as two pipelined
+        batches at the start of a run instead of one round trip per laser. Channels shared by
+        several lasers keep their power to the per-laser _laser_prepare().
+        """
+        specs = self._obis_lasers()
+        if not self.obis or not specs:
+            return
+        chans = [int(l.channel) for l in specs]
+        batch = {l.id: l for l in specs if l.power_w is not None and chans.count(int(l.channel)) == 1}
+        if batch:
+            self.obis.set_powers({int(l.channel): float(l.power_w) for l in batch.values()})
+        self.obis.all_off(sorted(set(chans)))
+        self._obis_powered = set(batch)
+
+    def _obis_all_off(self):
+        """All enabled OBIS channels off in one batch (end of run, also after errors)."""
+        chans = sorted({int(l.channel) for l in self._obis_lasers()})
+        if self.obis and chans:
+            self.obis.all_off(chans)
+
+    def _laser_prepare(self, ls: LaserSpec):
+        """Everything needed before emission that does not light the detector (mode, power)."""
         if ls.type == "CUBE":
             if not self.cube: raise RuntimeError("CUBE port not configured")
-            self.cube.on(power_mw=ls.power_mw or 12.0)
+            self.cube.configure(power_mw=ls.power_mw or 12.0)
         elif ls.type == "OBIS":
             if not self.obis or ls.channel is None: raise RuntimeError("OBIS port or channel missing")
-            self.obis.on(ls.channel)
-            if ls.power_w is not None:
+            if ls.power_w is not None and ls.id not in self._obis_powered:
                 self.obis.set_power_w(ls.channel, ls.power_w)
         elif ls.type == "RELAY":
             if not self.relay or ls.relay_channel is None: raise RuntimeError("Relay port/channel missing")
-            self.relay.on(ls.relay_channel)
         else:
             raise ValueError(f"Unknown laser type {ls.type}")
 
+    def _laser_emit(self, ls: LaserSpec):
+        if ls.type == "CUBE":
+            if not self.cube.emission_on():
+                raise RuntimeError(f"CUBE did not settle at {self.cube.power_mw} mW within {self.cube.settle_max_s:.1f} s")
+        elif ls.type == "OBIS":
+            self.obis.on(ls.channel)
+        elif ls.type == "RELAY":
+            self.relay.on(ls.relay_channel)
+
+    def _laser_on(self, ls: LaserSpec):
+        self._laser_prepare(ls)
+        self._laser_emit(ls)
+
     def _laser_off(self, ls: LaserSpec):
         if ls.type == "CUBE":
             if self.cube: self.cube.off()
@@ -70,12 +123,48 @@ class MeasurementRunner:
         elif ls.type == "RELAY":
             if self.relay and ls.relay_channel is not None: self.relay.off(ls.relay_channel)
 
+    def _submit(self, ls: LaserSpec, fn, *args) -> Future:
+        w = self._workers.get(ls.type)
+        if w is None:
+            w = self._workers[ls.type] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"laser-{ls.type}")
+        return w.submit(fn, *args)
+
+    def _shutdown_workers(self):
+        for w in self._workers.values():
+            w.shutdown(wait=True)
+        self._workers.clear()
+
+    def _read_many(self, run_root: Path, label: str, n: int, it_ms: float) -> np.ndarray:
+        if not self.cfg.measure.raw_capture:
+            return self.spec.read_many(n)
+        raw_path, stats_path = raw_capture_paths(run_root, label)
+        y = self.spec.read_many(n, raw_capture_path=str(raw_path))
+        save_cycle_stats(stats_path, self.spec.last_stats(), it_ms, n)
+        return y
+
+    def _dark(self, darks: Optional[DarkLibrary], run_root: Path, ls: LaserSpec, it_ms: float, sn: str, provenance: Dict[str, str]) -> np.ndarray:
+        label = f"{ls.id}_dark"
+        if darks is None:
+            return self._read_many(run_root, label, self.cfg.measure.n_dark, it_ms)
+        temp = self.spec.detector_temperature()
+        match = darks.lookup(sn, it_ms, temp, npix=self.spec.npix_active)
+        if match is not None:
+            print(f"[{ls.id}] Dark from library ({match.source}) at IT={it_ms:.3f} ms, T={temp:.1f} C")
+            provenance[label] = match.source
+            return match.rcm
+        y = self._read_many(run_root, label, self.cfg.measure.n_dark, it_ms)
+        e = darks.add(sn, it_ms, temp, y, self.spec.last_stats()["rcs"], self.cfg.measure.n_dark)
+        provenance[label] = f"measured:{e.path.name if e.path else ''}"
+        return y
+
     def run(self, on_live: Optional[Callable[[np.ndarray, float, float, str], None]] = None) -> MeasurementResult:
+        t0 = time.perf_counter()
         self._connect_devices()
+        logger: Optional[DataLogger] = None
         try:
             paths = prepare_run_dir(self.cfg.output.base_dir, self.spec.serial_number)
-            logger = DataLogger(paths)
-            logger.log_meta({
+            logger = DataLogger(paths, write_csv=self.cfg.output.write_csv)
+            meta = {
                 "serial_number": self.spec.serial_number,
                 "npix": self.spec.npix_active,
                 "config": {
@@ -83,7 +172,11 @@ class MeasurementRunner:
                     "lasers": [vars(l) for l in self.cfg.lasers],
                     "avantes": vars(self.cfg.avantes),
                 }
-            })
+            }
+            logger.log_meta(meta)
+            self._obis_powered = set()
+            try: self._obis_setup()
+            except Exception as e: print(f"OBIS batch setup failed, configuring per laser: {e}")
 
             success_map: Dict[str, bool] = {}
             p = self.cfg.measure
@@ -91,22 +184,56 @@ class MeasurementRunner:
                 it_min_ms=p.it_min_ms, it_max_ms=p.it_max_ms,
                 target_low=p.target_low, target_high=p.target_high,
                 step_up_ms=p.step_up_ms, step_down_ms=p.step_down_ms,
-                max_adjust_iters=p.max_adjust_iters, sat_thresh=p.sat_thresh
+                max_adjust_iters=p.max_adjust_iters, sat_thresh=p.sat_thresh,
+                strategy=p.autoit_strategy
             ))
+            it_cache: Optional[ITCache] = None
+            if p.use_it_cache:
+                cache_path = self.cfg.output.it_cache_path or Path(self.cfg.output.base_dir) / "it_cache.json"
+                it_cache = ITCache(Path(cache_path), max_age_h=p.it_cache_max_age_h)
+            sn = self.spec.serial_number
+
+            lasers = self.cfg.lasers
+            prepared: Dict[str, Future] = {}
+            darks: Optional[DarkLibrary] = None
+            if p.reuse_darks:
+                dirs = [paths.root / "darks"] + ([Path(self.cfg.output.dark_cache_dir)] if self.cfg.output.dark_cache_dir else [])
+                darks = DarkLibrary(dirs, it_tol_ms=p.dark_it_tol_ms, temp_tol_c=p.dark_temp_tol_c,
+                                    max_age_h=p.dark_max_age_h, interpolate=p.dark_interpolate,
+                                    max_interp_span_ms=p.dark_max_interp_span_ms)
+            meta["darks"] = {}
+
+            def next_enabled(i: int) -> Optional[LaserSpec]:
+                return next((l for l in lasers[i+1:] if l.enabled), None)
+
+            def laser_off(i: int, ls: LaserSpec):
+                self._submit(ls, self._laser_off, ls).result()
+                # Pipelined: set up the next laser (no emission) while this one's dark is acquired
+                nxt = next_enabled(i) if p.pipeline else None
+                if nxt is not None:
+                    prepared[nxt.id] = self._submit(nxt, self._laser_prepare, nxt)
 
-            for ls in self.cfg.lasers:
+            for i, ls in enumerate(lasers):
                 if not ls.enabled:
                     success_map[ls.id] = False
                     continue
 
                 try:
-                    self._laser_on(ls)
+                    prep = prepared.pop(ls.id, None) or self._submit(ls, self._laser_prepare, ls)
+                    prep.result()
+                    self._submit(ls, self._laser_emit, ls).result()
                 except Exception as e:
                     print(f"[{ls.id}] Laser ON failed: {e}")
                     success_map[ls.id] = False
+                    # Emission may have been switched on (e.g. a CUBE that did not settle)
+                    try: laser_off(i, ls)
+                    except Exception as e2: print(f"[{ls.id}] Laser OFF failed: {e2}")
                     continue
 
                 start_it = self.cfg.measure.start_it_ms.get(ls.id, self.cfg.measure.start_it_ms.get("default", 2.4))
+                cached = it_cache.lookup(sn, ls, p.it_min_ms, p.it_max_ms) if it_cache else None
+                if cached:
+                    start_it = cached.it_ms
                 current_it = [start_it]
 
                 def set_it(ms: float):
@@ -124,25 +251,42 @@ class MeasurementRunner:
 
                 it_final, last_peak, ok = auto.tune(read_peak, set_it, start_it, on_progress=progress)
                 success_map[ls.id] = ok
+                print(f"[{ls.id}] Auto-IT ({p.autoit_strategy}{', cached seed' if cached else ''}): IT={it_final:.3f} ms, peak={last_peak:.1f}, frames={auto.last_iters}")
+                if it_cache:
+                    if ok: it_cache.store(sn, ls, it_final, last_peak)
+                    else: it_cache.invalidate(sn, ls)
+                    try: it_cache.save()
+                    except Exception as e: print(f"IT cache save failed: {e}")
                 if not ok:
                     print(f"[{ls.id}] Auto-IT failed (peak={last_peak:.1f}). Skipping capture.")
-                    self._laser_off(ls)
+                    laser_off(i, ls)
                     continue
 
                 # Signal
                 self.spec.set_integration_ms(it_final)
-                y_sig = self.spec.read_many(self.cfg.measure.n_sig)
+                y_sig = self._read_many(paths.root, ls.id, p.n_sig, it_final)
                 ts = datetime.now().isoformat(timespec="seconds")
-                logger.add_frame(ts, ls.id, "SIG", 0, it_final, y_sig.tolist())
+                logger.add_frame(ts, ls.id, "SIG", 0, it_final, y_sig)
 
-                # Dark
-                self._laser_off(ls)
-                y_dark = self.spec.read_many(self.cfg.measure.n_dark)
+                # Dark (laser must be off before it starts)
+                laser_off(i, ls)
+                y_dark = self._dark(darks, paths.root, ls, it_final, sn, meta["darks"])
                 ts = datetime.now().isoformat(timespec="seconds")
-                logger.add_frame(ts, f"{ls.id}_dark", "DARK", 0, it_final, y_dark.tolist())
+                logger.add_frame(ts, f"{ls.id}_dark", "DARK", 0, it_final, y_dark)
 
                 logger.flush()
 
-            return MeasurementResult(run_dir=str(paths.root), success_map=success_map)
+            wall = time.perf_counter() - t0
+            meta["wall_time_s"] = wall
+            meta["success"] = success_map
+            logger.log_meta(meta)
+            print(f"Run finished in {wall:.1f} s ({'pipelined' if p.pipeline else 'sequential'})")
+            return MeasurementResult(run_dir=str(paths.root), success_map=success_map, wall_time_s=wall)
         finally:
+            self._shutdown_workers()
+            try: self._obis_all_off()
+            except Exception as e: print(f"OBIS off failed: {e}")
+            if logger:
+                try: logger.close()
+                except Exception as e: print(f"Closing frame log failed: {e}")
             self._disconnect_devices()
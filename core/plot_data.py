@@ -0,0 +1,34 @@
+from typing import Dict
+import base64
+import numpy as np
+
+# Spectra go to Plotly as binary typed arrays instead of JSON number lists: plotly.py
+# encodes NumPy arrays as {"dtype", "bdata"} (base64 of the raw buffer), so figure builders
+# hand over float32 arrays; hand-written payloads for running pages use typed_array() and
+# are decoded in the page by TYPED_ARRAY_JS.
+
+def float32(a) -> np.ndarray:
+    """Contiguous float32 copy/view of 'a' (counts and normalized LSFs fit float32's 24-bit mantissa)."""
+    return np.ascontiguousarray(a, dtype=np.float32)
+
+def typed_array(a, dtype=np.float32) -> Dict[str, str]:
+    """Plotly typed-array spec of 'a': little-endian buffer as base64, plus the shape for 2-D data."""
+    a = np.ascontiguousarray(a, dtype=np.dtype(dtype).newbyteorder("<"))
+    spec = {"dtype": a.dtype.str[1:], "bdata": base64.b64encode(a.tobytes()).decode("ascii")}
+    if a.ndim > 1:
+        spec["shape"] = ", ".join(str(n) for n in a.shape)
+    return spec
+
+# decodeTyped(spec): JS typed array for a typed_array() spec (array of row views for 2-D)
+TYPED_ARRAY_JS = """
+function decodeTyped(s) {
+  var b = atob(s.bdata), u = new Uint8Array(b.length);
+  for (var i = 0; i < b.length; i++) u[i] = b.charCodeAt(i);
+  var T = {f4: Float32Array, f8: Float64Array, i4: Int32Array, u2: Uint16Array}[s.dtype];
+  var a = new T(u.buffer);
+  if (!s.shape) return a;
+  var dims = s.shape.split(',').map(Number), n = dims[1], rows = [];
+  for (var r = 0; r < dims[0]; r++) rows.push(a.subarray(r * n, (r + 1) * n));
+  return rows;
+}
+"""
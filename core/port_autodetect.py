@@ -1,34 +1,178 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+import json
+import os
+import time
 import serial.tools.list_ports
 from ..drivers.obis_controller import ObisController
 from ..drivers.cube_controller import CubeController
+from ..drivers.relay_controller import RelayController
+from .config import AppConfig
 
-def autodetect_ports() -> Dict[str, Optional[str]]:
-    ports = [p.device for p in serial.tools.list_ports.comports()]
-    res: Dict[str, Optional[str]] = {"obis_port": None, "cube_port": None}
+DEVICE_KEYS = ("obis_port", "cube_port", "relay_port")
 
-    for p in ports:
-        # Check for OBIS
-        try:
-            obis = ObisController(port=p)
-            obis.connect()
-            if obis.is_present():
-                res["obis_port"] = p
-                continue # Found it, don't check for CUBE
-        except:
-            pass
-        finally:
-            if "obis" in locals() and obis: obis.close()
-
-        # Check for CUBE
+def port_hw_key(p) -> str:
+    """Stable identity of a port across launches: USB VID/PID/serial/location, or the device name for non-USB ports."""
+    if getattr(p, "vid", None) is None:
+        return f"DEV:{p.device}"
+    return f"USB:{p.vid:04X}:{p.pid or 0:04X}:{p.serial_number or ''}:{p.location or ''}"
+
+# Probes query right after opening; the identity timeout covers a slow device
+PROBE_SETTLE_S = 0.02
+
+def _identify(p, role: str, relay_hints: Sequence[str], timeout: float, baud_obis: int, baud_cube: int) -> bool:
+    """One identity check of port 'p' for a single device role."""
+    if role == "relay_port":
+        return RelayController.matches_port(p, relay_hints)
+    dev = None
+    try:
+        if role == "obis_port":
+            dev = ObisController(port=p.device, baudrate=baud_obis, timeout=timeout, connect_settle_s=PROBE_SETTLE_S)
+        else:
+            dev = CubeController(port=p.device, baudrate=baud_cube, timeout=timeout, connect_settle_s=PROBE_SETTLE_S)
+        dev.connect()
+        return dev.is_present()
+    except:
+        return False
+    finally:
+        if dev: dev.close()
+
+def _probe_port(p, relay_hints: Sequence[str], timeout: float, baud_obis: int, baud_cube: int,
+                roles: Sequence[str] = DEVICE_KEYS) -> Optional[str]:
+    """Device key (one of 'roles') found on port 'p' (ListPortInfo) or None. Relay boards have no identity query: matched by USB metadata."""
+    for role in ("relay_port", "obis_port", "cube_port"):
+        if role in roles and _identify(p, role, relay_hints, timeout, baud_obis, baud_cube):
+            return role
+    return None
+
+def autodetect_ports(relay_hints: Sequence[str] = ("relay",), probe_timeout_s: float = 0.3,
+                     port_deadline_s: float = 2.0, max_workers: int = 16,
+                     baudrate_obis: int = 115200, baudrate_cube: int = 19200) -> Dict[str, Optional[str]]:
+    """
+    Probe all serial ports concurrently for the OBIS, CUBE and relay devices.
+
+    probe_timeout_s is the response timeout of a single identity query; a port whose probe
+    has not finished within port_deadline_s is given up on (its thread closes the port when
+    it eventually returns). Returns as soon as every device has been found.
+    """
+    return _scan(list(serial.tools.list_ports.comports()), relay_hints, probe_timeout_s, port_deadline_s,
+                 max_workers, baudrate_obis, baudrate_cube)[0]
+
+def _scan(ports, relay_hints, probe_timeout_s, port_deadline_s, max_workers, baudrate_obis, baudrate_cube,
+          roles: Sequence[str] = DEVICE_KEYS):
+    """(role -> device, role -> ListPortInfo) for the given roles, probing 'ports' concurrently."""
+    res: Dict[str, Optional[str]] = {k: None for k in roles}
+    res_info: Dict[str, object] = {}
+    if not ports:
+        return res, res_info
+
+    workers = max(1, min(max_workers, len(ports)))
+    ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="port-probe")
+    try:
+        pending = {ex.submit(_probe_port, p, relay_hints, probe_timeout_s, baudrate_obis, baudrate_cube, roles): p for p in ports}
+        # Ports queued behind a full pool get their deadline once they could have started
+        rounds = -(-len(ports) // workers)
+        deadline = time.monotonic() + port_deadline_s * rounds
+        while pending and any(v is None for v in res.values()):
+            left = deadline - time.monotonic()
+            if left <= 0:
+                print(f"Port probe timed out: {', '.join(p.device for p in pending.values())}")
+                break
+            done, _ = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+            for f in done:
+                p = pending.pop(f)
+                key = f.result()
+                if key and res[key] is None:
+                    res[key] = p.device
+                    res_info[key] = p
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+    return res, res_info
+
+class PortMap:
+    """
+    Persistent map port hardware key (port_hw_key) -> device role ("obis_port", "cube_port",
+    "relay_port"), plus the roles not found on any port during the last search ("absent"),
+    stored as JSON.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.roles: Dict[str, str] = {}
+        self.absent: List[str] = []
+
+    def load(self) -> "PortMap":
         try:
-            cube = CubeController(port=p)
-            cube.connect()
-            if cube.is_present():
-                res["cube_port"] = p
-        except:
-            pass
-        finally:
-            if "cube" in locals() and cube: cube.close()
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.roles = {str(k): str(v) for k, v in data.get("ports", {}).items() if v in DEVICE_KEYS}
+            self.absent = [r for r in data.get("absent", []) if r in DEVICE_KEYS]
+        except FileNotFoundError:
+            self.roles, self.absent = {}, []
+        except Exception as e:
+            print(f"Ignoring unreadable port map {self.path}: {e}")
+            self.roles, self.absent = {}, []
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ports": self.roles, "absent": sorted(self.absent)}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+def _validate_cached(ports, roles: Dict[str, str], relay_hints, timeout, baud_obis, baud_cube) -> Optional[Dict[str, Optional[str]]]:
+    """Ports of the cached roles if every one is present and answers its identity check, else None."""
+    by_key = {port_hw_key(p): p for p in ports}
+    found = {}
+    for key, role in roles.items():
+        if key not in by_key or role in found:
+            return None
+        found[role] = by_key[key]
+    with ThreadPoolExecutor(max_workers=max(1, len(found)), thread_name_prefix="port-check") as ex:
+        checks = {role: ex.submit(_identify, p, role, relay_hints, timeout, baud_obis, baud_cube) for role, p in found.items()}
+        if not all(f.result() for f in checks.values()):
+            return None
+    res: Dict[str, Optional[str]] = {k: None for k in DEVICE_KEYS}
+    for role, p in found.items():
+        res[role] = p.device
+    return res
+
+def autodetect_for_config(cfg: AppConfig, force_scan: bool = False) -> Dict[str, Optional[str]]:
+    """
+    Device ports for the app, using the persistent port map (serial.port_map_path, default
+    <base_dir>/port_map.json): the remembered ports are checked with one identity query each,
+    and only if one is missing or answers wrongly (or force_scan) all ports are probed and the
+    map is rewritten. Devices the map knows neither a port for nor as absent are looked for on
+    the remaining ports once; roles recorded as absent are only searched for again on
+    force_scan ("Rescan Ports"), so a missing device does not cause identity queries to
+    unrelated ports on every launch.
+    """
+    sc = cfg.serial
+    args = (sc.relay_port_hints, sc.autodetect_probe_timeout_s)
+    bauds = (sc.baudrate_obis, sc.baudrate_cube)
+    pm = PortMap(Path(sc.port_map_path or Path(cfg.output.base_dir) / "port_map.json")).load()
+    ports = list(serial.tools.list_ports.comports())
+
+    if (pm.roles or pm.absent) and not force_scan:
+        res = _validate_cached(ports, pm.roles, *args, *bauds)
+        if res is not None:
+            missing = [r for r in DEVICE_KEYS if res[r] is None and r not in pm.absent]
+            if not missing:
+                return res
+            others = [p for p in ports if port_hw_key(p) not in pm.roles]
+            found, info = _scan(others, *args, sc.autodetect_port_deadline_s, 16, *bauds, roles=missing)
+            res.update({r: d for r, d in found.items() if d})
+            pm.roles.update({port_hw_key(p): role for role, p in info.items()})
+            pm.absent += [r for r in missing if r not in info]
+            try: pm.save()
+            except Exception as e: print(f"Port map save failed: {e}")
+            return res
+        print("Port map out of date, scanning all ports")
 
+    res, info = _scan(ports, *args, sc.autodetect_port_deadline_s, 16, *bauds)
+    pm.roles = {port_hw_key(p): role for role, p in info.items()}
+    pm.absent = [r for r in DEVICE_KEYS if r not in info]
+    try: pm.save()
+    except Exception as e: print(f"Port map save failed: {e}")
     return res
@@ -0,0 +1,32 @@
+from pathlib import Path
+from typing import Dict, Any, Tuple
+import numpy as np
+
+def raw_capture_paths(run_root: Path, label: str) -> Tuple[Path, Path]:
+    """(<run>/raw/<label>_cycles.npy, <run>/raw/<label>_stats.npz) for one measurement."""
+    d = Path(run_root) / "raw"
+    d.mkdir(parents=True, exist_ok=True)
+    return d / f"{label}_cycles.npy", d / f"{label}_stats.npz"
+
+def save_cycle_stats(path: Path, stats: Dict[str, Any], it_ms: float, ncy: int):
+    np.savez(path, rcm=stats["rcm"], rcs=stats["rcs"], rcl=stats["rcl"],
+             it_ms=float(it_ms), ncy=int(ncy), raw_ncy_written=int(stats["raw_ncy_written"]),
+             raw_file=Path(stats["raw_file"]).name if stats.get("raw_file") else "")
+
+def load_raw_cycles(stats_path: Path, mmap: bool = True) -> np.ndarray:
+    """
+    Cycles of one raw capture in acquisition order, shape (n_kept, npix), uint16.
+    When more cycles were measured than the ring holds, only the latest ones are kept.
+    """
+    stats_path = Path(stats_path)
+    with np.load(stats_path) as st:
+        raw_name = str(st["raw_file"])
+        written = int(st["raw_ncy_written"])
+    if not raw_name:
+        raise FileNotFoundError(f"No raw capture recorded in {stats_path}")
+    ring = np.load(stats_path.parent / raw_name, mmap_mode="r" if mmap else None)
+    rows = ring.shape[0]
+    if written <= rows:
+        return ring[:written]
+    start = written % rows
+    return np.concatenate([ring[start:], ring[:start]], axis=0)
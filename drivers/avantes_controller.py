@@ -35,6 +35,10 @@ except Exception as e1:
         _IMPORT_ERROR, _IMPORT_TB = e2, traceback.format_exc()
         Avantes_Spectrometer = None  # type: ignore
 
+# The driver module imports on any OS, but the DLL can only be loaded on Windows.
+if Avantes_Spectrometer is not None and getattr(sys.modules.get(Avantes_Spectrometer.__module__), "windll", None) is None:
+    _IMPORT_ERROR, _IMPORT_TB = OSError("ctypes.windll not available: Avantes DLL cannot be loaded on this platform"), None
+
 # -----------------------------------------------------------------------------
 # Default logger exposed by drivers package (if present)
 # -----------------------------------------------------------------------------
@@ -56,7 +60,14 @@ class _SimAvantes:
         self.sn = "SIM-AVA-0000"
         self.npix_active = int(npix)
         self.rcm = np.zeros(self.npix_active, float)
+        self.rcs = np.zeros(self.npix_active, float)
+        self.rcl = np.zeros(self.npix_active, float)
         self._it_ms = 2.4
+        self.raw_capture_file = None
+        self.raw_capture_max_ncy = 1000
+        self.rc_raw = None
+        self.raw_ncy_written = 0
+        self.raw_capture_done_file = None
         self.dll_path = None
         self.logger = DEFAULT_LOGGER
         self.alias = "Avantes (Simulated)"
@@ -89,15 +100,37 @@ class _SimAvantes:
 
     def measure(self, ncy: int = 1):
         ncy = max(1, int(ncy))
+        self.rc_raw, self.raw_ncy_written, self.raw_capture_done_file = None, 0, None
+        if self.raw_capture_file:
+            rows = max(1, min(ncy, int(self.raw_capture_max_ncy)))
+            self.rc_raw = np.lib.format.open_memmap(self.raw_capture_file, mode="w+", dtype=np.uint16, shape=(rows, self.npix_active))
         y = np.zeros(self.npix_active, float)
-        for _ in range(ncy):
-            y += self._spectrum()
+        yy = np.zeros(self.npix_active, float)
+        for i in range(ncy):
+            s = self._spectrum()
+            y += s
+            yy += s * s
+            if self.rc_raw is not None:
+                np.clip(s, 0, 65535, out=self.rc_raw[i % self.rc_raw.shape[0]], casting="unsafe")
+                self.raw_ncy_written += 1
         self.rcm = y / ncy
+        self.rcs = np.sqrt(np.maximum(yy - ncy * self.rcm ** 2, 0.0) / (ncy - 1)) if ncy > 1 else np.array([])
+        self.rcl = self.rcs
+        self.close_raw_capture()
         return "OK"
 
+    def close_raw_capture(self):
+        if self.rc_raw is not None and self.raw_capture_file:
+            self.rc_raw.flush()
+            self.raw_capture_done_file = self.raw_capture_file
+        self.raw_capture_file = None
+
     def wait_for_measurement(self) -> str:
         return "OK"
 
+    def read_aux_sensor(self, sname: str = "detector"):
+        return "OK", 25.0
+
 
 # -----------------------------------------------------------------------------
 # Controller (does NOT modify avantes_spectrometer.py)
@@ -116,6 +149,9 @@ class AvantesController:
         self.dll_path: Optional[str] = kwargs.get("dll_path")
         self.simulate: bool = bool(kwargs.get("simulate", False))
         self.alias: str = kwargs.get("alias", "Avantes")
+        self.raw_capture_max_ncy: int = int(kwargs.get("raw_capture_max_ncy", 1000))
+        # Driver-compatible simulator used instead of _SimAvantes (e.g. sim_rig.SimSpectrometer)
+        self.sim_device = kwargs.get("sim_device")
 
         self.logger = kwargs.get("logger") or DEFAULT_LOGGER
         if not self.logger.handlers:
@@ -132,11 +168,11 @@ class AvantesController:
     # -----------------------------
     def connect(self):
         # Choose real driver unless simulate is requested or import failed
-        use_sim = self.simulate or (Avantes_Spectrometer is None) or (_IMPORT_ERROR is not None)
+        use_sim = self.simulate or self.sim_device is not None or (Avantes_Spectrometer is None) or (_IMPORT_ERROR is not None)
 
         if self._ava is None:
             if use_sim:
-                self._ava = _SimAvantes()
+                self._ava = self.sim_device if self.sim_device is not None else _SimAvantes()
             else:
                 self._ava = Avantes_Spectrometer()  # type: ignore
 
@@ -163,6 +199,11 @@ class AvantesController:
             except Exception:
                 pass
 
+            try:
+                self._ava.raw_capture_max_ncy = self.raw_capture_max_ncy
+            except Exception:
+                pass
+
         self.logger.info(f"AvantesController: connecting {self.alias}")
         self._ava.connect()
         self._connected = True
@@ -245,6 +286,15 @@ class AvantesController:
     # -----------------------------
     # controls
     # -----------------------------
+    def detector_temperature(self) -> float:
+        """Detector temperature [degC] from the aux sensor, NaN if it cannot be read."""
+        self._ensure_connected()
+        try:
+            res, value = self._ava.read_aux_sensor("detector")
+        except Exception:
+            return float("nan")
+        return float(value) if res == "OK" and value != -99.0 else float("nan")
+
     def set_integration_ms(self, ms: float):
         """
         Ensure device + parlist are ready, then set integration time.
@@ -299,10 +349,32 @@ class AvantesController:
         self._wait_ok()
         return np.array(self._ava.rcm, dtype=float)
 
-    def read_many(self, n: int) -> np.ndarray:
+    def read_many(self, n: int, raw_capture_path: Optional[str] = None) -> np.ndarray:
+        """
+        Mean of n cycles. If raw_capture_path is given, every cycle is also streamed
+        (uint16, memory-mapped .npy ring) into that file; see last_stats().
+        """
         self._ensure_connected()
         if n <= 0:
             raise ValueError("n must be >= 1")
-        self._ava.measure(ncy=int(n))
-        self._wait_ok()
+        if raw_capture_path:
+            self._ava.raw_capture_file = str(raw_capture_path)
+        try:
+            self._ava.measure(ncy=int(n))
+            self._wait_ok()
+        finally:
+            if raw_capture_path and hasattr(self._ava, "close_raw_capture"):
+                self._ava.close_raw_capture()
         return np.array(self._ava.rcm, dtype=float)
+
+    def last_stats(self) -> dict:
+        """rcm/rcs/rcl of the last measurement plus the raw capture file and cycle count (if any)."""
+        if not self._ava:
+            raise RuntimeError("Spectrometer not connected.")
+        return {
+            "rcm": np.asarray(getattr(self._ava, "rcm", []), dtype=float),
+            "rcs": np.asarray(getattr(self._ava, "rcs", []), dtype=float),
+            "rcl": np.asarray(getattr(self._ava, "rcl", []), dtype=float),
+            "raw_file": getattr(self._ava, "raw_capture_done_file", None),
+            "raw_ncy_written": int(getattr(self._ava, "raw_ncy_written", 0)),
+        }
@@ -6,10 +6,15 @@
 from spec_xfus import spec_clock, calc_msl
 import logging
 import ctypes
-from ctypes import windll,c_char,Structure,c_uint,c_byte,c_ushort,sizeof,byref,c_ubyte,c_float,c_uint8,c_uint16,c_uint32,c_double,c_bool,c_int
+from ctypes import c_char,Structure,c_uint,c_byte,c_ushort,sizeof,byref,c_ubyte,c_float,c_uint8,c_uint16,c_uint32,c_double,c_bool,c_int
+try:
+    from ctypes import windll
+except ImportError: #Not on Windows -> the dll cannot be loaded, only the simulation mode can be used
+    windll=None
 import numpy as np
 from time import sleep
 from copy import deepcopy
+from collections import deque
 import sys
 import os
 import threading
@@ -333,6 +338,19 @@ class Avantes_Spectrometer():
         # compatible with blind pixels. So only can be used for spectrometers without blind pixels.
         # Also, the number of measurements that can be stored in the ROE RAM is limited, depending on the roe RAM
 
+        #Raw capture (opt-in):
+        self.raw_capture_file=None #(E) None, or path of a .npy file. If set, every handled cycle of the next measurement
+        # (active pixels, discriminator factor applied, clipped to uint16) is streamed into this memory-mapped file,
+        # so that the individual cycles can be analyzed offline (e.g. outlier rejection), not only the mean.
+        # The file is a ring buffer of raw_capture_max_ncy rows: cycle i (from 1) goes to row (i-1)%raw_capture_max_ncy.
+        # Note: this parameter is cleared at the end of every measurement, it must be set again for each measurement.
+        self.raw_capture_max_ncy=1000 #(E) Maximum number of cycles kept in the raw capture file (integer). Bounds disk/memory usage to raw_capture_max_ncy*npix_active*2 bytes.
+
+        #Cycle buffers:
+        self.rc_buffer_pool_size=8 #(I) Maximum number of preallocated ctypes raw counts buffers kept for reuse by read_data() (integer).
+        # Buffers travel from read_data() (data arrival thread) to handle_cycle_data() (data handling thread) through the
+        # handle_data_queue, and are given back to the pool once handled, so no new buffer is allocated per cycle.
+
         #Performance tests:
         self.performance_test_it_ms_list=np.arange(2.4,10.1,0.1) #(I) List or Array with the different integration times to be tested during the performance test. [ms]
         self.performance_test_ncy_list=[1,10,100,500,1000,2000] #(I) List or Array with the different number of cycles to be tested during the performance test. [list of int]
@@ -363,6 +381,9 @@ class Avantes_Spectrometer():
         self.rcm_blind_left=np.array([]) #(E) same as rcm, but for the blind pixels at the left side of the detector
         self.rcs_blind_left=np.array([]) #(E) same as rcs, but for the blind pixels at the left side of the detector
         self.rcl_blind_left=np.array([]) #(E) same as rcl, but for the blind pixels at the left side of the detector
+        self.rc_raw=None #(E) Memory-mapped (raw_capture_max_ncy, npix_active) uint16 array with the cycles of the last raw capture measurement (or None)
+        self.raw_ncy_written=0 #(E) Number of cycles written into rc_raw during the last raw capture measurement (integer)
+        self.raw_capture_done_file=None #(E) Path of the raw capture file of the last measurement (or None)
 
         #Post-processing actions
         self.external_meas_done_event=None #(E) External event to be set when a measurement is complete (apart from the internal_meas_done_event). (None or threading.Event object, Optional).
@@ -374,6 +395,11 @@ class Avantes_Spectrometer():
         self.handle_data_queue=Queue() #(I) Will store the data arrival queue. When a measurement is done, the data will be put here for subsequent data handling.
         self.data_arrival_watchdog_thread=None #(I) Will store the data arrival watchdog thread
         self.data_handling_watchdog_thread=None #(I) Will store the data handling watchdog thread
+        self.rc_buffer_pool=deque() #(I) Free (rc,rc_blind_left) ctypes buffer pairs, see get_rc_buffers() / release_rc_buffers()
+        self.rc_scaled=np.zeros(0,dtype=np.float64) #(I) Preallocated array for the counts of one cycle with the discriminator factor applied (active pixels)
+        self.rc_work=np.zeros(0,dtype=np.float64) #(I) Preallocated work array for handle_cycle_data (active pixels)
+        self.rcb_scaled=np.zeros(0,dtype=np.float64) #(I) Same as rc_scaled, for the blind pixels at left side of the detector
+        self.rcb_work=np.zeros(0,dtype=np.float64) #(I) Same as rc_work, for the blind pixels at left side of the detector
 
         #(I) Measurement callback function: avantes dll will call this function to notify that a measurement is ready to be read.
         CALLBACK_FUNC_TYPE = ctypes.CFUNCTYPE(None, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int))
@@ -618,6 +644,7 @@ class Avantes_Spectrometer():
 
         self.ncy_requested=ncy
         self.reset_spec_data() #reset accumulated data and measurements done/handled counters
+        self.open_raw_capture(ncy) #Prepare the raw capture file (only if raw_capture_file is set)
 
         if self.simulation_mode:
             if self.debug_mode>=1:
@@ -1532,6 +1559,12 @@ class Avantes_Spectrometer():
         self.sy_blind_left=np.zeros(self.npix_blind_left,dtype=np.float64) #Sum of the counts of the blind pixels at left side of the detector
         self.syy_blind_left=np.zeros(self.npix_blind_left,dtype=np.float64) #Sum of the squared counts of the blind pixels at left side of the detector
         self.sxy_blind_left=np.zeros(self.npix_blind_left,dtype=np.float64) #Sum of the meas index by the counts of the blind pixels at left side of the detector
+        if self.rc_work.shape[0]!=self.npix_active: #(re)allocate the handle_cycle_data work arrays only if npix changed
+            self.rc_scaled=np.zeros(self.npix_active,dtype=np.float64)
+            self.rc_work=np.zeros(self.npix_active,dtype=np.float64)
+        if self.rcb_work.shape[0]!=self.npix_blind_left:
+            self.rcb_scaled=np.zeros(self.npix_blind_left,dtype=np.float64)
+            self.rcb_work=np.zeros(self.npix_blind_left,dtype=np.float64)
         self.arrival_times=[] #List of arrival times of the measurements (Time in which the callback function was called)
         self.meas_start_time=0 #Unix time in seconds when the measurement started
         self.meas_end_time=0 #Unix time in seconds when the measurement ended (data arrival time of the last measured cycle)
@@ -1644,16 +1677,16 @@ class Avantes_Spectrometer():
             <rc_blind_left> raw counts of the blind pixels on the left side of the detector (if any)
         """
         self.busy=True
+        #Get (preallocated) input buffers:
+        rc,rc_blind_left=self.get_rc_buffers()
         if self.simulation_mode:
-            #Create ramdom data:
-            rc=np.random.rand(self.npix_active)*1000
-            rc_blind_left=np.random.rand(self.npix_blind_left)*1000
+            #Create ramdom data (written in place into the buffers):
+            np.multiply(np.random.rand(self.npix_active),1000,out=self.rc_view(rc))
+            if self.npix_blind_left>0:
+                np.multiply(np.random.rand(self.npix_blind_left),1000,out=self.rc_view(rc_blind_left))
             res="OK"
         else:
-            #Create input buffers:
             a_pTimeLabel=c_uint() #ticks count last pixel of spectrum is received by microcontroller ticks in 10 uS units since spectrometer started
-            rc=(c_double*self.npix_active)() #input buffer where to store raw counts
-            rc_blind_left=(c_double*self.npix_blind_left)() #input buffer where to store the raw counts of the left-side blind pixels.
 
             #Get active pixels data
             resdll=self.dll_handler.AVS_GetScopeData(self.spec_id,byref(a_pTimeLabel),byref(rc))
@@ -1672,8 +1705,46 @@ class Avantes_Spectrometer():
                         res="Could not get left-side blind pixels data from spec "+self.alias+". Error: "+res
                         self.logger.error("read_data, "+res)
         self.busy=False
+        if res!="OK":
+            self.release_rc_buffers(rc,rc_blind_left)
         return res,rc,rc_blind_left
 
+    def get_rc_buffers(self):
+        """
+        rc,rc_blind_left=get_rc_buffers()
+        Get a pair of ctypes input buffers (c_double arrays of npix_active and npix_blind_left elements) to read
+        one cycle into. Reuses a free pair from the pool if possible, otherwise allocates a new one.
+        """
+        while True:
+            try:
+                rc,rc_blind_left=self.rc_buffer_pool.pop()
+            except IndexError:
+                break
+            if len(rc)==self.npix_active and len(rc_blind_left)==self.npix_blind_left: #discard buffers of another pixel config
+                return rc,rc_blind_left
+        rc,rc_blind_left=(c_double*self.npix_active)(),(c_double*self.npix_blind_left)()
+        #Keep a numpy view of each buffer with it, so that it is created only once per buffer:
+        rc.npview=np.frombuffer(rc,dtype=np.float64)
+        rc_blind_left.npview=np.frombuffer(rc_blind_left,dtype=np.float64)
+        return rc,rc_blind_left
+
+    @staticmethod
+    def rc_view(rc):
+        """
+        Numpy float64 view of a raw counts buffer (no copy for the ctypes buffers of get_rc_buffers()).
+        """
+        view=getattr(rc,"npview",None)
+        if view is None:
+            view=np.ctypeslib.as_array(rc) if isinstance(rc,ctypes.Array) else np.asarray(rc,dtype=np.float64)
+        return view
+
+    def release_rc_buffers(self,rc,rc_blind_left):
+        """
+        Give a pair of input buffers back to the pool, once its data has been handled.
+        """
+        if isinstance(rc,ctypes.Array) and len(self.rc_buffer_pool)<self.rc_buffer_pool_size:
+            self.rc_buffer_pool.append((rc,rc_blind_left))
+
 
     #Auxiliary functions for data handling
 
@@ -1758,12 +1829,10 @@ class Avantes_Spectrometer():
             <issat>: boolean, True if the last handled data is saturated, False otherwise.
         """
 
-        #Convert raw counts ctypes array to numpy array
-        rc=np.array(rc)
-        #Convert to float64
-        rc=rc.astype(np.float64)
-        #Apply discriminator factor:
-        rc=rc*float(self.discriminator_factor)
+        #View the raw counts ctypes array as a numpy array (no copy) and apply the discriminator factor
+        #into the preallocated float64 array (in place, no temporary arrays):
+        rc_buf=rc
+        rc=np.multiply(self.rc_view(rc_buf),float(self.discriminator_factor),out=self.rc_scaled)
         rcmax=rc.max()
         rcmin=rc.min()
         #TODO: Check consistency of the data. (eg. all elements >0, no nans, etc.)
@@ -1777,34 +1846,72 @@ class Avantes_Spectrometer():
             #No more cycles will be handled from now on.
             #This cycle data won't be used.
             #(in the accumulated data there won't be any saturated cycle)
+            self.release_rc_buffers(rc_buf,rc_blind_left)
             return issat #-> Quit
 
         else: #Continue even if saturation is detected:
 
-            #Add cycle data to accumulated data for active pixels:
-            self.sy=self.sy+rc
-            self.syy=self.syy+rc**2
-            self.sxy=self.sxy+(ncy_read-1)*rc
+            #Stream the cycle into the raw capture file (if enabled), so it holds exactly the accumulated cycles:
+            if self.rc_raw is not None:
+                row=self.rc_raw[(ncy_read-1)%self.rc_raw.shape[0]]
+                np.clip(rc,0,65535,out=row,casting="unsafe")
+                self.raw_ncy_written+=1
+
+            #Add cycle data to accumulated data for active pixels (in place, no temporary arrays):
+            tmp=self.rc_work
+            np.add(self.sy,rc,out=self.sy)
+            np.multiply(rc,rc,out=tmp)
+            np.add(self.syy,tmp,out=self.syy)
+            if ncy_read>1:
+                np.multiply(rc,float(ncy_read-1),out=tmp)
+                np.add(self.sxy,tmp,out=self.sxy)
 
             #Do the same for blind pixels (if any):
             if len(rc_blind_left)>0:
-                #Convert ctypes array to numpy array
-                rc_blind_left=np.array(rc_blind_left)
-                #Convert to float64
-                rc_blind_left=rc_blind_left.astype(np.float64)
-                #Apply discriminator factor:
-                rc_blind_left=rc_blind_left*float(self.discriminator_factor)
-                #Add data to accumulated data:
-                self.sy_blind_left=self.sy_blind_left+rc_blind_left
-                self.syy_blind_left=self.syy_blind_left+rc_blind_left**2
-                self.sxy_blind_left=self.sxy_blind_left+(ncy_read-1)*rc_blind_left
+                rcb=np.multiply(self.rc_view(rc_blind_left),float(self.discriminator_factor),out=self.rcb_scaled)
+                tmp=self.rcb_work
+                np.add(self.sy_blind_left,rcb,out=self.sy_blind_left)
+                np.square(rcb,out=tmp)
+                np.add(self.syy_blind_left,tmp,out=self.syy_blind_left)
+                if ncy_read>1:
+                    np.multiply(rcb,float(ncy_read-1),out=tmp)
+                    np.add(self.sxy_blind_left,tmp,out=self.sxy_blind_left)
 
             self.ncy_handled+=1
             if issat:
                 self.ncy_saturated+=1
 
+        #The input buffers are not needed anymore: give them back to the pool.
+        self.release_rc_buffers(rc_buf,rc_blind_left)
         return issat
 
+    def open_raw_capture(self,ncy):
+        """
+        Create the memory-mapped raw capture file for a measurement of ncy cycles, if self.raw_capture_file is set.
+        The ring buffer has min(ncy,raw_capture_max_ncy) rows of npix_active uint16 counts (.npy format).
+        """
+        self.rc_raw=None
+        self.raw_ncy_written=0
+        self.raw_capture_done_file=None
+        if self.raw_capture_file:
+            nrows=max(1,min(int(ncy),int(self.raw_capture_max_ncy)))
+            try:
+                self.rc_raw=np.lib.format.open_memmap(self.raw_capture_file,mode="w+",dtype=np.uint16,shape=(nrows,self.npix_active))
+            except Exception as e:
+                self.logger.error("open_raw_capture, could not create raw capture file "+str(self.raw_capture_file)+" for spec "+self.alias+": "+str(e))
+                self.rc_raw=None
+
+    def close_raw_capture(self):
+        """
+        Flush the raw capture file of the last measurement to disk, and disable raw capture for the next measurement.
+        """
+        if self.rc_raw is not None and self.raw_capture_file:
+            self.rc_raw.flush()
+            self.raw_capture_done_file=self.raw_capture_file
+            if self.debug_mode>=1:
+                self.logger.debug("Raw capture of spec "+self.alias+": "+str(self.raw_ncy_written)+" cycles written to "+str(self.raw_capture_file))
+        self.raw_capture_file=None
+
     def measurement_done(self):
         """
         Final actions to be done when a measurement is complete.
@@ -1817,6 +1924,7 @@ class Avantes_Spectrometer():
         if self.npix_blind_left>0: #same for blind pixels
             _,self.rcm_blind_left,self.rcs_blind_left,self.rcl_blind_left=calc_msl(self.alias,x,self.sxy_blind_left,self.sy_blind_left,self.syy_blind_left)
             self.rcl_blind_left=self.rcs_blind_left #replace rcl by rcs for blind pixels
+        self.close_raw_capture()
 
         if self.debug_mode>=1:
             self.logger.debug("Measurement done for spec "+self.alias)
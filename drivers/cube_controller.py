@@ -3,15 +3,33 @@ import time
 from typing import Optional
 
 class CubeController:
-    def __init__(self, port, baudrate = 19200, timeout = 1.0):
+    """
+    Coherent CUBE serial driver. Every command is answered with one CR/LF terminated
+    line (optionally preceded by a 'CUBE>' prompt), which is read with 'timeout' as
+    deadline instead of sleeping a fixed time.
+
+    emission_on() polls the laser state (?L) and output power (?P) until it emits at
+    the configured power (within power_tol, relative), for at most settle_max_s.
+    """
+    PROMPT = "CUBE>"
+
+    def __init__(self, port, baudrate = 19200, timeout = 1.0, settle_max_s = 10.0,
+                 power_tol = 0.05, poll_s = 0.1, connect_settle_s = 0.2):
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.settle_max_s = settle_max_s
+        self.power_tol = power_tol
+        self.poll_s = poll_s
+        self.connect_settle_s = connect_settle_s
+        self.power_mw: Optional[float] = None
         self.ser = None
 
     def connect(self):
-        self.ser = serial.Serial(self.port, self.baudrate, self.timeout)
-        time.sleep(0.2)
+        self.ser = serial.Serial(self.port, self.baudrate, timeout=self.timeout, write_timeout=self.timeout)
+        time.sleep(self.connect_settle_s)
+        try: self.ser.reset_input_buffer()
+        except: pass
 
     def close(self):
         if self.ser:
@@ -19,20 +37,72 @@ class CubeController:
             except: pass
         self.ser = None
 
+    def _readline(self) -> Optional[str]:
+        """Next non-empty response line without prompt, or None on timeout."""
+        deadline = time.monotonic() + (self.timeout or 1.0)
+        while time.monotonic() < deadline:
+            raw = self.ser.read_until(b"\n")
+            if not raw:
+                return None
+            line = raw.decode("utf-8", errors="ignore").strip()
+            while line.startswith(self.PROMPT):
+                line = line[len(self.PROMPT):].strip()
+            if line:
+                return line
+        return None
+
     def _send(self, cmd) -> str:
         if not self.ser:
             raise RuntimeError("CUBE not connected")
+        try: self.ser.reset_input_buffer()
+        except: pass
         full = (cmd+ "\r\n").encode('utf-8')
         self.ser.write(full)
-        time.sleep(1)
-        return self.ser.read_all().decode("utf-8", errors="ignore").strip()
-    
-    def on(self, power_mw=12.0):
+        return self._readline() or ""
+
+    def query(self, cmd) -> str:
+        """Value of a '?X' query: the part after '=' in 'X=value' answers."""
+        res = self._send(cmd)
+        return res.split("=", 1)[1].strip() if "=" in res else res
+
+    def query_float(self, cmd) -> float:
+        try:
+            return float(self.query(cmd).split()[0])
+        except (ValueError, IndexError):
+            return float("nan")
+
+    def configure(self, power_mw=12.0):
+        """Mode and power setup; does not switch emission on."""
         self._send("EXT=1")
         self._send("CW=1")
         self._send(f"P={power_mw}")
+        self.power_mw = float(power_mw)
+
+    def is_emitting(self) -> bool:
+        """True once emission is on and the output power is within power_tol of the set power."""
+        if self.query("?L") != "1":
+            return False
+        if self.power_mw is None:
+            return True
+        p = self.query_float("?P")
+        return abs(p - self.power_mw) <= self.power_tol * max(self.power_mw, 1e-9)
+
+    def emission_on(self, max_wait_s: Optional[float] = None) -> bool:
+        """Switch emission on and wait until the laser reports it at the set power."""
         self._send("L=1")
-        time.sleep(3)
+        limit = self.settle_max_s if max_wait_s is None else max_wait_s
+        t0 = time.monotonic()
+        while True:
+            if self.is_emitting():
+                return True
+            if time.monotonic() - t0 >= limit:
+                print(f"CUBE not settled at {self.power_mw} mW after {limit:.1f} s")
+                return False
+            time.sleep(self.poll_s)
+
+    def on(self, power_mw=12.0, max_wait_s: Optional[float] = None) -> bool:
+        self.configure(power_mw)
+        return self.emission_on(max_wait_s)
 
     def off(self):
         self._send("L=0")
@@ -42,4 +112,4 @@ class CubeController:
             res = self._send("IDN?")
             return "CUBE" in res
         except Exception:
-            return False
\ No newline at end of file
+            return False
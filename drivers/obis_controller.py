@@ -2,7 +2,7 @@
 import serial
 import serial.tools.list_ports
 import time
-from typing import Optional, List
+from typing import Optional, List, Sequence, Dict, Iterable
 
 
 class ObisController:
@@ -10,14 +10,23 @@ class ObisController:
     Minimal OBIS laser serial driver (SCPI-like).
     Keeps your original interface but fixes the PySerial kwargs bug and
     makes I/O a bit more robust.
+
+    Every OBIS reply ends with an 'OK' or 'ERR-xxx' line, so commands return
+    as soon as that line arrives instead of waiting for the line to go idle.
+    'timeout' is the per-command response deadline.
     """
 
-    def __init__(self, port: str, baudrate: int = 115200, timeout: float = 1.0):
+    # Serial read timeout: upper bound for one blocking read while waiting for bytes
+    POLL_S = 0.02
+
+    def __init__(self, port: str, baudrate: int = 115200, timeout: float = 1.0, connect_settle_s: float = 0.2):
         self.port: str = port
         self.baudrate: int = int(baudrate)
         # PySerial expects timeout in seconds (float or None)
         self.timeout: Optional[float] = None if timeout in (None, "", "None") else float(timeout)
         self.ser: Optional[serial.Serial] = None
+        self.connect_settle_s = float(connect_settle_s)
+        self._rx = bytearray()
 
     # -----------------------------
     # Lifecycle
@@ -32,7 +41,7 @@ class ObisController:
         self.ser = serial.Serial(
             port=self.port,
             baudrate=self.baudrate,
-            timeout=self.timeout,             # <- keyword (fixes your error)
+            timeout=self.POLL_S if self.timeout is None else min(self.timeout, self.POLL_S),  # <- keyword (fixes your error)
             write_timeout=self.timeout,
             bytesize=serial.EIGHTBITS,
             parity=serial.PARITY_NONE,
@@ -43,8 +52,9 @@ class ObisController:
         )
 
         # Give the device a moment to be ready
-        time.sleep(0.2)
+        time.sleep(self.connect_settle_s)
         # Clear any residual input
+        self._rx.clear()
         try:
             self.ser.reset_input_buffer()
             self.ser.reset_output_buffer()
@@ -73,47 +83,82 @@ class ObisController:
         self.ser.write(data)
         self.ser.flush()
 
-    def _read_all(self, idle_window: float = 0.08, max_time: Optional[float] = None) -> bytes:
+    def _read_line(self, deadline: float) -> Optional[str]:
         """
-        Read until the input stream stays idle for 'idle_window' seconds or
-        until 'max_time' (if provided) elapses.
+        Next response line (stripped, may be empty) or None if 'deadline'
+        (time.monotonic()) passes first. Returns as soon as the terminator arrives;
+        bytes after it stay buffered for the next response.
         """
         self._ensure_open()
-        start = time.monotonic()
-        last_len = -1
-        buf = bytearray()
-
         while True:
+            nl = self._rx.find(b"\n")
+            if nl >= 0:
+                line = bytes(self._rx[:nl])
+                del self._rx[:nl + 1]
+                return line.decode("ascii", errors="ignore").replace("\r", "").strip()
+            if time.monotonic() >= deadline:
+                return None
+            # Blocks at most POLL_S (the port's read timeout) when nothing arrives
             chunk = self.ser.read(self.ser.in_waiting or 1)
             if chunk:
-                buf += chunk
+                self._rx += chunk
 
-            # Stop if no growth for idle_window
-            time.sleep(idle_window)
-            if len(buf) == last_len:
-                break
-            last_len = len(buf)
+    def _read_response(self, deadline: float) -> List[str]:
+        """
+        Lines of one command response up to and including its terminating
+        'OK' / 'ERR...' line. On timeout returns whatever arrived (possibly []).
+        """
+        lines: List[str] = []
+        while True:
+            ln = self._read_line(deadline)
+            if ln is None:
+                return lines
+            if not ln:
+                continue
+            lines.append(ln)
+            if self.is_terminator(ln):
+                return lines
 
-            if max_time is not None and (time.monotonic() - start) > max_time:
-                break
+    @staticmethod
+    def is_terminator(line: str) -> bool:
+        u = line.upper()
+        return u == "OK" or u.startswith("ERR")
+
+    def _discard_input(self):
+        self._rx.clear()
+        try:
+            self.ser.reset_input_buffer()
+        except Exception:
+            pass
 
-        return bytes(buf)
+    def _deadline(self) -> float:
+        return time.monotonic() + (self.timeout or 1.0)
 
     def _send(self, cmd: str) -> List[str]:
         """
-        Send a command and return all response lines (stripped).
-        Mirrors your original behaviour but uses a more reliable read.
+        Send a command and return its response lines (stripped), including the
+        final 'OK' / 'ERR-xxx'. Returns as soon as the terminator is received,
+        or after 'timeout' seconds with whatever arrived.
         """
+        self._ensure_open()
+        # Drop leftovers of a previous (timed out) response so they are not taken for ours
+        self._discard_input()
         self._write_line(cmd)
-        # Short dwell to allow device to answer
-        time.sleep(0.05)
-        raw = self._read_all(idle_window=0.05, max_time=self.timeout or 1.0)
-        if not raw:
+        return self._read_response(self._deadline())
+
+    def send_many(self, cmds: Sequence[str]) -> List[List[str]]:
+        """
+        Pipelined variant of _send: all commands are written at once, then one
+        response per command is read back in order, each within 'timeout'.
+        """
+        self._ensure_open()
+        if not cmds:
             return []
-        # Normalize CR/LF and split
-        text = raw.decode("ascii", errors="ignore").replace("\r", "")
-        lines = [ln.strip() for ln in text.split("\n") if ln.strip() != ""]
-        return lines
+        self._discard_input()
+        data = "".join(c + "\r\n" for c in cmds).encode("ascii", errors="ignore")
+        self.ser.write(data)
+        self.ser.flush()
+        return [self._read_response(self._deadline()) for _ in cmds]
 
     # -----------------------------
     # High-level commands (your API)
@@ -127,6 +172,21 @@ class ObisController:
     def set_power_w(self, channel: int, watts: float):
         self._send(f"SOUR{channel}:POW:LEV:IMM:AMPL {float(watts):.3f}")
 
+    def set_states(self, states: Dict[int, bool]) -> Dict[int, List[str]]:
+        """Switch several channels in one pipelined batch, e.g. {1: True, 3: False}."""
+        chans = list(states)
+        res = self.send_many([f"SOUR{ch}:AM:STAT {'ON' if states[ch] else 'OFF'}" for ch in chans])
+        return dict(zip(chans, res))
+
+    def set_powers(self, levels: Dict[int, float]) -> Dict[int, List[str]]:
+        """Set the power of several channels [W] in one pipelined batch, e.g. {3: 0.03, 5: 0.005}."""
+        chans = list(levels)
+        res = self.send_many([f"SOUR{ch}:POW:LEV:IMM:AMPL {float(levels[ch]):.3f}" for ch in chans])
+        return dict(zip(chans, res))
+
+    def all_off(self, channels: Iterable[int]) -> Dict[int, List[str]]:
+        return self.set_states({int(ch): False for ch in channels})
+
     def is_present(self) -> bool:
         """
         Try both *IDN? and IDN? since firmwares vary.
@@ -27,4 +27,14 @@ class RelayController:
     def off(self, n):
         if not self.ser:
             raise RuntimeError("Relay is not connected")
-        self.ser.write(f"R{n}R\r".encode())
\ No newline at end of file
+        self.ser.write(f"R{n}R\r".encode())
+    @staticmethod
+    def matches_port(port_info, hints) -> bool:
+        """
+        The relay board does not answer an identity query, so it is recognised by its
+        USB metadata: any hint (case-insensitive) found in description, manufacturer,
+        product or hwid ("VID:PID=16C0:05DF" style hints work too).
+        """
+        fields = [getattr(port_info, a, None) for a in ("description", "manufacturer", "product", "hwid")]
+        text = " ".join(str(f) for f in fields if f).upper()
+        return any(h and h.upper() in text for h in hints)
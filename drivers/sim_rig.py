@@ -0,0 +1,498 @@
+# SciLab/drivers/sim_rig.py
+"""
+Hardware-in-the-loop simulator: a spectrometer model plus OBIS / CUBE / relay devices on
+pseudo-terminals, so MeasurementRunner and Auto-IT run unchanged against the real serial
+drivers without hardware.
+
+    with SimRig(cfg, time_scale=1.0) as rig:      # sets cfg.serial.*_port to the pty devices
+        MeasurementRunner(cfg, sim_spectrometer=rig.spectrometer).run()
+        print(rig.stats())
+
+Everything random comes from one seeded generator and the spectra only depend on the
+laser state at measurement time, so a run with the same config and seed takes the same
+Auto-IT path, frame counts and modelled acquisition time on any machine. Waits (IT plus
+cycle delay, device latencies, CUBE warm-up) are modelled in seconds and slept for
+time_scale times as long; stats() reports the modelled totals, which do not depend on
+the host.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+class SimClock:
+    """Sleeps modelled durations, scaled by time_scale (0: no real waiting)."""
+    def __init__(self, time_scale: float = 1.0):
+        self.time_scale = max(0.0, float(time_scale))
+
+    def sleep(self, model_s: float):
+        if model_s > 0 and self.time_scale > 0:
+            time.sleep(model_s * self.time_scale)
+
+    def model_elapsed(self, t0_monotonic: float) -> float:
+        """Modelled seconds since the real time.monotonic() stamp t0."""
+        if self.time_scale == 0:
+            return float("inf")
+        return (time.monotonic() - t0_monotonic) / self.time_scale
+
+@dataclass
+class DetectorModel:
+    npix: int = 2048
+    nbits: int = 16                     # eff_saturation_limit = 2**nbits - 1
+    cdt_ms: float = 0.9                 # cycle delay time added to every cycle (readout, transfer)
+    bias: float = 900.0                 # ADC offset [counts]
+    read_noise: float = 12.0            # [counts rms] per cycle
+    gain: float = 0.5                   # counts per photo/dark electron (shot noise variance = gain * counts)
+    dark_rate: float = 0.5              # dark signal [counts/ms] at temp_ref_c
+    dark_doubling_c: float = 6.0        # dark current doubles every ... degC
+    dark_nonuniformity: float = 0.1     # relative per-pixel spread of the dark rate (fixed pattern)
+    temperature_c: float = 25.0
+    temp_ref_c: float = 25.0
+    temp_drift_c_per_h: float = 0.0     # detector temperature drift over modelled time
+    wl_range: Tuple[float, float] = (250.0, 750.0)  # wavelength [nm] at the first and last pixel
+    line_sigma_px: float = 2.5
+    counts_per_ms_per_mw: float = 500.0 # line peak rate per mW of laser power
+    seed: int = 0
+
+class SimSpectrometer:
+    """
+    Avantes_Spectrometer stand-in for AvantesController (attributes and methods it uses).
+    measure(ncy) draws ncy cycles of bias + (dark + laser lines) * IT with shot and read
+    noise, quantized and clipped at eff_saturation_limit; wait_for_measurement() returns
+    once ncy * (IT + cdt) modelled time has passed.
+    """
+    RAW_CHUNK = 256     # cycles drawn per batch
+
+    def __init__(self, model: Optional[DetectorModel] = None, clock: Optional[SimClock] = None,
+                 illumination: Callable[[], List[Tuple[float, float]]] = lambda: []):
+        self.model = model or DetectorModel()
+        self.clock = clock or SimClock()
+        self.illumination = illumination    # -> [(center pixel, peak rate counts/ms)] of the emitting lasers
+        m = self.model
+        self.sn = f"SIM-RIG-{m.seed:04d}"
+        self.npix_active = int(m.npix)
+        self.nbits = int(m.nbits)
+        self.eff_saturation_limit = 2 ** self.nbits - 1
+        self.rcm = np.zeros(self.npix_active, float)
+        self.rcs = np.zeros(self.npix_active, float)
+        self.rcl = np.zeros(self.npix_active, float)
+        self._it_ms = 2.4
+        self.raw_capture_file = None
+        self.raw_capture_max_ncy = 1000
+        self.rc_raw = None
+        self.raw_ncy_written = 0
+        self.raw_capture_done_file = None
+        self.dll_path = None
+        self.logger = None
+        self.alias = "Avantes (Sim rig)"
+        self.simulate = True
+        self.parlist = object()
+        # Timeline of the last measurement in modelled seconds (see calc_performance_stats)
+        self.store_to_ram = False
+        self.ncy_requested = 0
+        self.it_ms = self._it_ms
+        self.arrival_times = np.empty(0)
+        self.meas_start_time = self.meas_end_time = self.data_handling_end_time = 0.0
+        self.model_time_s = 0.0
+        self.n_measurements = 0
+        self.n_cycles = 0
+        self._due = 0.0
+        self._rng = np.random.default_rng(m.seed)
+        self._x = np.arange(self.npix_active, dtype=float)
+        self._dark_pattern = np.clip(1.0 + m.dark_nonuniformity * self._rng.standard_normal(self.npix_active), 0.0, None)
+
+    def connect(self):
+        if self.logger:
+            self.logger.info(f"[sim] connect {self.alias}")
+        return "OK"
+
+    def disconnect(self, dofree: bool = True, **_):
+        if self.logger:
+            self.logger.info(f"[sim] disconnect {self.alias}")
+        return "OK"
+
+    def set_it(self, ms: float):
+        self._it_ms = float(ms)
+        return "OK"
+
+    def detector_temperature(self) -> float:
+        m = self.model
+        return m.temperature_c + m.temp_drift_c_per_h * self.model_time_s / 3600.0
+
+    def read_aux_sensor(self, sname: str = "detector"):
+        return "OK", self.detector_temperature()
+
+    def expected_counts(self, it_ms: Optional[float] = None) -> np.ndarray:
+        """Noise-free mean counts per pixel at it_ms (default: current IT), before clipping."""
+        m = self.model
+        it = self._it_ms if it_ms is None else float(it_ms)
+        dark = m.dark_rate * 2.0 ** ((self.detector_temperature() - m.temp_ref_c) / m.dark_doubling_c) * self._dark_pattern
+        rate = dark.copy()
+        for center, peak in self.illumination():
+            rate += peak * np.exp(-0.5 * ((self._x - center) / m.line_sigma_px) ** 2)
+        return m.bias + rate * it
+
+    def measure(self, ncy: int = 1):
+        m = self.model
+        ncy = max(1, int(ncy))
+        it = self._it_ms
+        self.it_ms, self.ncy_requested = it, ncy
+        self.rc_raw, self.raw_ncy_written, self.raw_capture_done_file = None, 0, None
+        if self.raw_capture_file:
+            rows = max(1, min(ncy, int(self.raw_capture_max_ncy)))
+            self.rc_raw = np.lib.format.open_memmap(self.raw_capture_file, mode="w+", dtype=np.uint16, shape=(rows, self.npix_active))
+
+        mean = self.expected_counts(it)
+        std = np.sqrt(m.gain * np.maximum(mean - m.bias, 0.0) + m.read_noise ** 2)
+        sy = np.zeros(self.npix_active)
+        syy = np.zeros(self.npix_active)
+        done = 0
+        while done < ncy:
+            rows = min(self.RAW_CHUNK, ncy - done)
+            rc = np.rint(mean + std * self._rng.standard_normal((rows, self.npix_active)))
+            np.clip(rc, 0, self.eff_saturation_limit, out=rc)
+            sy += rc.sum(axis=0)
+            syy += np.einsum("ij,ij->j", rc, rc)
+            if self.rc_raw is not None:
+                for k in range(rows):
+                    self.rc_raw[(done + k) % self.rc_raw.shape[0]] = rc[k]
+                self.raw_ncy_written += rows
+            done += rows
+        self.rcm = sy / ncy
+        self.rcs = np.sqrt(np.maximum(syy - ncy * self.rcm ** 2, 0.0) / (ncy - 1)) if ncy > 1 else np.array([])
+        self.rcl = self.rcs
+
+        cycle_s = (it + m.cdt_ms) / 1000.0
+        self.meas_start_time = self.model_time_s
+        self.arrival_times = self.meas_start_time + cycle_s * np.arange(1, ncy + 1)
+        self.meas_end_time = self.data_handling_end_time = float(self.arrival_times[-1])
+        self.model_time_s = self.meas_end_time
+        self.n_measurements += 1
+        self.n_cycles += ncy
+        self._due = time.monotonic() + ncy * cycle_s * self.clock.time_scale
+        self.close_raw_capture()
+        return "OK"
+
+    def close_raw_capture(self):
+        if self.rc_raw is not None and self.raw_capture_file:
+            self.rc_raw.flush()
+            self.raw_capture_done_file = self.raw_capture_file
+        self.raw_capture_file = None
+
+    def wait_for_measurement(self) -> str:
+        left = self._due - time.monotonic()
+        if left > 0:
+            time.sleep(left)
+        return "OK"
+
+    def calc_performance_stats(self, showinfo=False):
+        """Same figures as Avantes_Spectrometer.calc_performance_stats, from the modelled timeline."""
+        real_dur_meas = 1000.0 * (self.meas_end_time - self.meas_start_time)
+        real_dur_fdh = 1000.0 * (self.data_handling_end_time - self.meas_end_time)
+        cdt_mean = max(0, (real_dur_meas - self.ncy_requested * self.it_ms) / max(1, self.ncy_requested))
+        deltas_max = deltas_min = np.nan
+        if len(self.arrival_times) > 1:
+            deltas = 1000.0 * np.diff(self.arrival_times)
+            deltas_max, deltas_min = float(np.max(deltas)), float(np.min(deltas))
+            cdt_median = float(np.median(deltas)) - self.it_ms
+        else:
+            cdt_median = cdt_mean
+        if showinfo and self.logger:
+            self.logger.info(f"[sim] last measurement: {real_dur_meas:.3f} ms, cdt_mean={cdt_mean:.3f} ms/cy")
+        return cdt_mean, cdt_median, real_dur_meas, real_dur_fdh, deltas_max, deltas_min
+
+# -----------------------------------------------------------------------------
+# Serial devices
+# -----------------------------------------------------------------------------
+class _PtyDevice(ABC):
+    """
+    Serial device on a pseudo-terminal pair: drivers open .port like a real COM port.
+    Commands are CR and/or LF terminated lines; each reply is written after latency_s
+    (modelled) by a server thread. POSIX only.
+    """
+    name = "device"
+
+    def __init__(self, clock: SimClock, latency_s: float = 0.002):
+        self.clock = clock
+        self.latency_s = float(latency_s)
+        self.port: Optional[str] = None
+        self.n_commands = 0
+        self.busy_model_s = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._master = self._slave = -1
+        self._processing = False
+
+    def start(self) -> str:
+        try:
+            import pty, tty
+        except ImportError as e:
+            raise RuntimeError("Simulated serial devices need pseudo-terminals (POSIX)") from e
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)     # no echo / line editing before the driver configures the port
+        self.port = os.ttyname(self._slave)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._serve, name=f"sim-{self.name}", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+        for fd in (self._master, self._slave):
+            try: os.close(fd)
+            except OSError: pass
+        self._master = self._slave = -1
+
+    def _serve(self):
+        import select
+        buf = bytearray()
+        while not self._stop.is_set():
+            r, _, _ = select.select([self._master], [], [], 0.05)
+            if not r:
+                continue
+            self._processing = True
+            try:
+                chunk = os.read(self._master, 4096)
+            except OSError:
+                break
+            buf += chunk
+            self._serve_lines(buf)
+            self._processing = False
+
+    def _serve_lines(self, buf: bytearray):
+        while True:
+            ends = [i for i in (buf.find(b"\r"), buf.find(b"\n")) if i >= 0]
+            if not ends:
+                break
+            i = min(ends)
+            line = bytes(buf[:i]).decode("ascii", errors="ignore").strip()
+            del buf[:i + 1]
+            if not line:
+                continue
+            with self._lock:
+                self.n_commands += 1
+                reply = self.handle(line)
+            self.clock.sleep(self.latency_s)
+            self.busy_model_s += self.latency_s
+            if reply is not None:
+                try:
+                    os.write(self._master, reply.encode("ascii"))
+                except OSError:
+                    return
+
+    def sync(self, timeout_s: float = 0.5):
+        """Wait until everything written to the device so far has been handled (for devices that never reply)."""
+        import select
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            pending, _, _ = select.select([self._master], [], [], 0)
+            if not pending and not self._processing:
+                return
+            time.sleep(0.0005)
+
+    @abstractmethod
+    def handle(self, line: str) -> Optional[str]:
+        """Reply (with line endings) to one command, None for no reply."""
+
+class ObisSim(_PtyDevice):
+    """OBIS remote: SCPI-like commands, every reply ends with an OK / ERR-xxx line."""
+    name = "obis"
+
+    def __init__(self, clock: SimClock, latency_s: float = 0.002):
+        super().__init__(clock, latency_s)
+        self.power_w: Dict[int, float] = {}
+        self.on: Dict[int, bool] = {}
+
+    def handle(self, line: str) -> Optional[str]:
+        u = line.upper()
+        if u in ("*IDN?", "IDN?"):
+            return "Coherent, Inc - OBIS LX (simulated)\r\nOK\r\n"
+        if u.startswith("SOUR") and ":" in u:
+            head, _, rest = u.partition(":")
+            try:
+                ch = int(head[4:])
+            except ValueError:
+                return "ERR-102\r\n"
+            if rest == "AM:STAT ON":
+                self.on[ch] = True
+                return "OK\r\n"
+            if rest == "AM:STAT OFF":
+                self.on[ch] = False
+                return "OK\r\n"
+            if rest == "AM:STAT?":
+                return ("ON" if self.on.get(ch) else "OFF") + "\r\nOK\r\n"
+            if rest.startswith("POW:LEV:IMM:AMPL "):
+                try:
+                    self.power_w[ch] = float(rest.split()[-1])
+                except ValueError:
+                    return "ERR-102\r\n"
+                return "OK\r\n"
+        return "ERR-100\r\n"
+
+    def emitted_mw(self, ch: int) -> float:
+        with self._lock:
+            return 1000.0 * self.power_w.get(ch, 0.0) if self.on.get(ch) else 0.0
+
+class CubeSim(_PtyDevice):
+    """
+    CUBE: one 'CUBE>' prefixed reply line per command. After L=1 the reported power (?P)
+    ramps linearly to the set power over warmup_s (modelled); the light reaching the
+    spectrometer is the set power, so spectra do not depend on host timing.
+    """
+    name = "cube"
+
+    def __init__(self, clock: SimClock, latency_s: float = 0.005, warmup_s: float = 0.5):
+        super().__init__(clock, latency_s)
+        self.warmup_s = float(warmup_s)
+        self.set_mw = 0.0
+        self.on = False
+        self._t_on = 0.0
+
+    def _reported_mw(self) -> float:
+        if not self.on:
+            return 0.0
+        if self.warmup_s <= 0:
+            return self.set_mw
+        return self.set_mw * min(1.0, self.clock.model_elapsed(self._t_on) / self.warmup_s)
+
+    def handle(self, line: str) -> Optional[str]:
+        u = line.upper().replace(" ", "")
+        if u == "IDN?":
+            out = "CUBE 405-50C (simulated)"
+        elif u == "?L":
+            out = f"L={int(self.on)}"
+        elif u == "?P":
+            out = f"P={self._reported_mw():.2f}"
+        elif u.startswith("P="):
+            try:
+                self.set_mw = float(u[2:])
+            except ValueError:
+                return "CUBE>Invalid Command\r\n"
+            out = u
+        elif u in ("L=1", "L=0"):
+            if u == "L=1" and not self.on:
+                self._t_on = time.monotonic()
+            self.on = u == "L=1"
+            out = u
+        elif u.startswith(("EXT=", "CW=", "T=", "CAL=")):
+            out = u
+        else:
+            out = "Invalid Command"
+        return f"CUBE>{out}\r\n"
+
+    def emitted_mw(self) -> float:
+        with self._lock:
+            return self.set_mw if self.on else 0.0
+
+class RelaySim(_PtyDevice):
+    """Relay board: R<n>S closes, R<n>R opens channel n; no replies."""
+    name = "relay"
+
+    def __init__(self, clock: SimClock, latency_s: float = 0.001):
+        super().__init__(clock, latency_s)
+        self.closed: Dict[int, bool] = {}
+
+    def handle(self, line: str) -> Optional[str]:
+        u = line.upper()
+        if len(u) >= 3 and u[0] == "R" and u[-1] in "SR":
+            try:
+                self.closed[int(u[1:-1])] = u[-1] == "S"
+            except ValueError:
+                pass
+        return None
+
+    def is_closed(self, ch: int) -> bool:
+        with self._lock:
+            return bool(self.closed.get(ch))
+
+# -----------------------------------------------------------------------------
+# Rig
+# -----------------------------------------------------------------------------
+class SimRig:
+    """
+    Simulated spectrometer and laser devices for the lasers of an AppConfig. start() opens
+    the serial devices and points cfg.serial.{obis,cube,relay}_port at them (cfg is
+    modified in place); pass rig.spectrometer to MeasurementRunner(sim_spectrometer=...).
+
+    Each laser's line sits at the pixel of its wavelength (numeric laser id, within
+    detector.wl_range) with a peak rate of counts_per_ms_per_mw times the power set on the
+    device; relay lasers emit relay_power_mw (or their power_mw) while the relay is closed.
+    """
+    def __init__(self, cfg, detector: Optional[DetectorModel] = None, time_scale: float = 1.0,
+                 obis_latency_s: float = 0.002, cube_latency_s: float = 0.005, relay_latency_s: float = 0.001,
+                 cube_warmup_s: float = 0.5, relay_power_mw: float = 10.0):
+        self.cfg = cfg
+        self.clock = SimClock(time_scale)
+        self.detector = detector or DetectorModel()
+        self.obis = ObisSim(self.clock, obis_latency_s)
+        self.cube = CubeSim(self.clock, cube_latency_s, cube_warmup_s)
+        self.relay = RelaySim(self.clock, relay_latency_s)
+        self.relay_power_mw = float(relay_power_mw)
+        self.spectrometer = SimSpectrometer(self.detector, self.clock, self.illumination)
+        self._centers = {ls.id: self._center_px(i, ls.id) for i, ls in enumerate(cfg.lasers)}
+
+    def _center_px(self, index: int, laser_id: str) -> float:
+        d = self.detector
+        wl0, wl1 = d.wl_range
+        try:
+            frac = (float(laser_id) - wl0) / (wl1 - wl0)
+        except ValueError:   # non-numeric id: spread over the detector in config order
+            frac = (index + 1) / (len(self.cfg.lasers) + 1)
+        return float(np.clip(frac, 0.0, 1.0) * (d.npix - 1))
+
+    def emitted_mw(self, ls) -> float:
+        if ls.type == "OBIS" and ls.channel is not None:
+            return self.obis.emitted_mw(int(ls.channel))
+        if ls.type == "CUBE":
+            return self.cube.emitted_mw()
+        if ls.type == "RELAY" and ls.relay_channel is not None and self.relay.is_closed(int(ls.relay_channel)):
+            return float(ls.power_mw or self.relay_power_mw)
+        return 0.0
+
+    def illumination(self) -> List[Tuple[float, float]]:
+        # The relay driver does not wait for an answer: let the board catch up with its last writes
+        if self.relay.port:
+            self.relay.sync()
+        out = []
+        for ls in self.cfg.lasers:
+            mw = self.emitted_mw(ls)
+            if mw > 0:
+                out.append((self._centers[ls.id], mw * self.detector.counts_per_ms_per_mw))
+        return out
+
+    def start(self) -> "SimRig":
+        s = self.cfg.serial
+        s.obis_port = self.obis.start()
+        s.cube_port = self.cube.start()
+        s.relay_port = self.relay.start()
+        self.cfg.avantes.simulate = True
+        return self
+
+    def stop(self):
+        for dev in (self.obis, self.cube, self.relay):
+            dev.stop()
+
+    def stats(self) -> Dict[str, object]:
+        """Modelled (host independent) time and counts so far."""
+        sp = self.spectrometer
+        devices = {d.name: {"commands": d.n_commands, "latency_model_s": round(d.busy_model_s, 6)}
+                   for d in (self.obis, self.cube, self.relay)}
+        return {"spectrometer": {"measurements": sp.n_measurements, "cycles": sp.n_cycles,
+                                 "acquisition_model_s": round(sp.model_time_s, 6)},
+                "devices": devices, "time_scale": self.clock.time_scale}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
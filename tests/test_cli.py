@@ -0,0 +1,48 @@
+"""
+Smoke tests of the spectro CLI: each subcommand is run as `python -m <package>.cli.spectro`
+on a synthetic run, so a wrong argument wiring fails here instead of in the lab.
+"""
+import importlib
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+for mod in ("numpy", "pandas", "pyarrow", "scipy", "plotly", "yaml"):
+    pytest.importorskip(mod)
+
+ROOT = Path(__file__).resolve().parents[1]
+PKG = ROOT.name          # the modules use relative imports: run them as <checkout dir>.cli.spectro
+sys.path.insert(0, str(ROOT.parent))
+suite = importlib.import_module(f"{PKG}.bench.suite")
+
+def spectro(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-m", f"{PKG}.cli.spectro", *args], cwd=ROOT.parent,
+                          capture_output=True, text=True, timeout=300)
+
+def test_help():
+    r = spectro("--help")
+    assert r.returncode == 0, r.stderr
+    for cmd in ("measure", "analyze", "recover", "analyze-batch"):
+        assert cmd in r.stdout
+
+def test_analyze(tmp_path):
+    pq_path = suite.write_synthetic_run(str(tmp_path), 10)
+    out = tmp_path / "analysis.json"
+    r = spectro("analyze", str(pq_path), "--output", str(out))
+    assert r.returncode == 0, r.stderr
+    assert out.exists()
+
+def test_analyze_batch(tmp_path):
+    suite.write_synthetic_run(str(tmp_path), 10)
+    out = tmp_path / "summary.csv"
+    r = spectro("analyze-batch", "--base-dir", str(tmp_path), "--jobs", "1", "--output", str(out))
+    assert r.returncode == 0, r.stderr
+    assert "Analyzed 1 runs" in r.stdout
+    assert out.exists()
+
+def test_recover_missing_run(tmp_path):
+    r = spectro("recover", str(tmp_path))
+    assert r.returncode == 0, r.stderr
+    assert "No frames" in r.stdout
@@ -1,7 +1,71 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QLabel
+import tempfile
+import threading
+import traceback
+from pathlib import Path
+from typing import Dict, Optional
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QLabel, QProgressBar, QTabWidget, QMessageBox
+)
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-import plotly.io as pio
-from ..core.analysis import analyze_run
+from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtCore import QObject, QThread, QUrl, pyqtSignal
+
+from .plot_detail import DetailBridge, ZOOM_SCRIPT
+
+# plotly and core.analysis (pandas, scipy) are imported on first use of the tab.
+# QtWebEngineWidgets stays a module import: Qt requires it before QApplication exists.
+
+# Figure rendered after each pipeline stage
+FIGURE_STAGES = {"lsf": "LSF", "sdf": "SDF", "fwhm": "Resolution"}
+# QWebEngineView.setHtml() silently fails above 2 MB; larger pages are loaded from a file
+_SETHTML_LIMIT = 1_500_000
+
+class AnalysisWorker(QObject):
+    """Runs analyze_run off the GUI thread, reporting each stage and the HTML of each finished figure."""
+    stage = pyqtSignal(str, int)        # stage name, number of completed stages
+    figure = pyqtSignal(str, str, object)   # figure tab, html, zoom detail source (or None)
+    finished = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    errored = pyqtSignal(str)
+
+    def __init__(self, parquet_path: str):
+        super().__init__()
+        self.parquet_path = parquet_path
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _render(self, name: str, data: Dict[str, object]):
+        import plotly.io as pio
+        from ..core.analysis import fig_lsf, fig_sdf, fig_resolution, lsf_detail, sdf_detail
+        # LSF and SDF start decimated to screen resolution; the view re-fetches detail on zoom
+        source = None
+        if name == "lsf":
+            source = lsf_detail(data["lsf_map"])
+            fig = fig_lsf(data["lsf_map"], source)
+        elif name == "sdf":
+            source = sdf_detail(data["sdf"], data["ordered"])
+            fig = fig_sdf(data["sdf"], data["ordered"], source)
+        else:
+            fig = fig_resolution(data["lambda_nm"], data["fwhm_nm"])
+        html = pio.to_html(fig, full_html=True, include_plotlyjs="cdn", post_script=ZOOM_SCRIPT if source else None)
+        if not self._cancel.is_set():
+            self.figure.emit(FIGURE_STAGES[name], html, source)
+
+    def run(self):
+        try:
+            from ..core.analysis import analyze_run, AnalysisCancelled, STAGES
+            def on_stage(name: str, data: Dict[str, object]):
+                self.stage.emit(name, STAGES.index(name) + 1)
+                if name in FIGURE_STAGES:
+                    self._render(name, data)
+            res = analyze_run(self.parquet_path, on_stage=on_stage, cancelled=self._cancel.is_set)
+            self.finished.emit(res)
+        except AnalysisCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.errored.emit(f"{e}\n{traceback.format_exc()}")
 
 class AnalysisView(QWidget):
     def __init__(self, parent=None):
@@ -11,23 +75,108 @@ class AnalysisView(QWidget):
         self.btnRow = QHBoxLayout()
         self.btnLoad = QPushButton("Load run (frames.parquet)")
         self.btnRow.addWidget(self.btnLoad)
+        self.btnCancel = QPushButton("Cancel")
+        self.btnCancel.setEnabled(False)
+        self.btnRow.addWidget(self.btnCancel)
+        self.progress = QProgressBar(self)
+        self.btnRow.addWidget(self.progress, 1)
         self.layout.addLayout(self.btnRow)
 
         self.lbl = QLabel("No run loaded.")
         self.layout.addWidget(self.lbl)
 
-        self.web = QWebEngineView(self)
-        self.layout.addWidget(self.web)
+        self.tabs = QTabWidget(self)
+        self.layout.addWidget(self.tabs, 1)
+        # Created with the first figure of each kind: a web view starts a Chromium render process
+        self.webs: Dict[str, QWebEngineView] = {}
+        self.details: Dict[str, DetailBridge] = {}
+        self._tmp = tempfile.TemporaryDirectory(prefix="scilab_analysis_")
+
+        self._thread: Optional[QThread] = None
+        self._worker: Optional[AnalysisWorker] = None
 
         self.btnLoad.clicked.connect(self._pick_and_analyze)
+        self.btnCancel.clicked.connect(self._cancel)
 
-    def _set_fig(self, fig):
-        html = pio.to_html(fig, full_html=True, include_plotlyjs="cdn")
-        self.web.setHtml(html)
+    def _web(self, name: str) -> QWebEngineView:
+        if name not in self.webs:
+            web = QWebEngineView(self)
+            self.details[name] = DetailBridge(web)
+            channel = QWebChannel(web.page())
+            channel.registerObject("detail", self.details[name])
+            web.page().setWebChannel(channel)
+            self.webs[name] = web
+            self.tabs.addTab(web, name)
+        return self.webs[name]
+
+    def _set_html(self, name: str, html: str, source: object = None):
+        web = self._web(name)
+        self.details[name].source = source
+        if len(html) < _SETHTML_LIMIT:
+            web.setHtml(html)
+        else:
+            path = Path(self._tmp.name) / f"{name}.html"
+            path.write_text(html, encoding="utf-8")
+            web.load(QUrl.fromLocalFile(str(path)))
+        self.tabs.setCurrentWidget(web)
 
     def _pick_and_analyze(self):
         path, _ = QFileDialog.getOpenFileName(self, "Select frames.parquet", "", "Parquet (*.parquet)")
         if not path: return
+        self.start(path)
+
+    def start(self, path: str):
+        if self._thread:
+            return
+        from ..core.analysis import STAGES
         self.lbl.setText(path)
-        res = analyze_run(path)
-        self._set_fig(res["figs"]["resolution"])
+        self.progress.setRange(0, len(STAGES))
+        self.progress.setValue(0)
+        self.progress.setFormat("%v / %m")
+        self.btnLoad.setEnabled(False)
+        self.btnCancel.setEnabled(True)
+
+        self._thread = QThread(self)
+        self._worker = AnalysisWorker(path)
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run)
+        self._worker.stage.connect(self._on_stage)
+        self._worker.figure.connect(self._set_html)
+        self._worker.finished.connect(self._on_finished)
+        self._worker.cancelled.connect(self._on_cancelled)
+        self._worker.errored.connect(self._on_error)
+        self._thread.start()
+
+    def _cancel(self):
+        if self._worker:
+            self._worker.cancel()
+            self.btnCancel.setEnabled(False)
+            self.progress.setFormat("cancelling...")
+
+    def _on_stage(self, name: str, done: int):
+        self.progress.setValue(done)
+        self.progress.setFormat(f"{name} (%v / %m)")
+
+    def _on_finished(self, res: object):
+        src = "cache" if res.get("cached") else "computed"
+        self.lbl.setText(f"{self._worker.parquet_path} ({len(res['ordered'])} lines, {src})")
+        self.progress.setFormat("done")
+        self._cleanup()
+
+    def _on_cancelled(self):
+        self.progress.setFormat("cancelled")
+        self._cleanup()
+
+    def _on_error(self, msg: str):
+        self.progress.setFormat("failed")
+        QMessageBox.critical(self, "Analysis failed", msg)
+        self._cleanup()
+
+    def _cleanup(self):
+        if self._thread:
+            self._thread.quit()
+            self._thread.wait()
+        self._thread = None
+        self._worker = None
+        self.btnLoad.setEnabled(True)
+        self.btnCancel.setEnabled(False)
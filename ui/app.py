@@ -6,25 +6,28 @@ from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import QObject, QThread, pyqtSignal
 
 from ..core.config import AppConfig, DEFAULT_CONFIG, load_config
-from ..core.port_autodetect import autodetect_ports
-from ..core.measurement import MeasurementRunner
+from ..core.port_autodetect import autodetect_for_config
 from .run_plan_widget import RunPlanWidget
 from .live_view import LiveView
+from .live_channel import LiveChannel
 from .analysis_view import AnalysisView
 
 class MeasureWorker(QObject):
-    live = pyqtSignal(object, float, float, str)
     finished = pyqtSignal(str)
     errored = pyqtSignal(str)
 
-    def __init__(self, cfg: AppConfig):
+    def __init__(self, cfg: AppConfig, channel: LiveChannel):
         super().__init__()
         self.cfg = cfg
+        # Live frames go through a latest-value slot polled by the LiveView, not per-frame signals
+        self.channel = channel
 
     def run(self):
         try:
+            # Drivers (ctypes, DLL lookup) load with the first measurement, not at startup
+            from ..core.measurement import MeasurementRunner
             runner = MeasurementRunner(self.cfg)
-            res = runner.run(on_live=lambda y, peak, it, lid: self.live.emit(y, peak, it, lid))
+            res = runner.run(on_live=self.channel.put)
             self.finished.emit(res.run_dir)
         except Exception as e:
             tb = traceback.format_exc()
@@ -45,6 +48,8 @@ class MainWindow(QWidget):
 
         self.plan = RunPlanWidget(cfg, self)
         self.live = LiveView(self)
+        self.live_channel = LiveChannel()
+        self.live.attach(self.live_channel, cfg.ui.live_max_fps)
         self.analysis = AnalysisView(self)
 
         tabs.addTab(self.plan, "Run Plan")
@@ -66,10 +71,10 @@ class MainWindow(QWidget):
         
         self.measurement_started.emit()
         self._thread = QThread(self)
-        self._worker = MeasureWorker(self._cfg)
+        self._worker = MeasureWorker(self._cfg, self.live_channel)
         self._worker.moveToThread(self._thread)
         self._thread.started.connect(self._worker.run)
-        self._worker.live.connect(self.live.update_live)
+        self.live.start()
         self._worker.finished.connect(self._on_finished)
         self._worker.errored.connect(self._on_error)
         self._thread.start()
@@ -86,6 +91,7 @@ class MainWindow(QWidget):
         if self._thread:
             self._thread.quit()
             self._thread.wait()
+        self.live.stop()
         self._thread = None
         self._worker = None
         self.measurement_finished.emit()
@@ -96,11 +102,13 @@ def main():
     except Exception:
         cfg = DEFAULT_CONFIG
     
-    detected_ports = autodetect_ports()
+    detected_ports = autodetect_for_config(cfg)
     if detected_ports["obis_port"]:
         cfg.serial.obis_port = detected_ports["obis_port"]
     if detected_ports["cube_port"]:
         cfg.serial.cube_port = detected_ports["cube_port"]
+    if detected_ports["relay_port"]:
+        cfg.serial.relay_port = detected_ports["relay_port"]
 
     app = QApplication(sys.argv)
     w = MainWindow(cfg)
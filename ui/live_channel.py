@@ -0,0 +1,41 @@
+import threading
+from typing import Optional, Tuple
+import numpy as np
+
+LiveFrame = Tuple[np.ndarray, float, float, str]   # (y, peak, it_ms, label)
+
+class LiveChannel:
+    """
+    Latest-value-wins hand-over of live frames from the measurement thread to the GUI.
+
+    The worker put()s every frame; the GUI take()s at its own refresh rate and gets only the
+    newest one, frames overwritten in between are counted as dropped. Updates without
+    spectrum data (Auto-IT progress) are not forwarded.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest: Optional[LiveFrame] = None
+        self.received = 0
+        self.displayed = 0
+        self.dropped = 0
+
+    def put(self, y: np.ndarray, peak: float, it_ms: float, label: str):
+        if not (isinstance(y, np.ndarray) and y.size):
+            return
+        with self._lock:
+            if self._latest is not None:
+                self.dropped += 1
+            self._latest = (y, peak, it_ms, label)
+            self.received += 1
+
+    def take(self) -> Optional[LiveFrame]:
+        with self._lock:
+            frame, self._latest = self._latest, None
+            if frame is not None:
+                self.displayed += 1
+            return frame
+
+    def reset(self):
+        with self._lock:
+            self._latest = None
+            self.received = self.displayed = self.dropped = 0
@@ -1,31 +1,133 @@
+from pathlib import Path
+import json
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import pyqtSlot
-import plotly.graph_objs as go
-import plotly.io as pio
+from PyQt5.QtCore import pyqtSlot, QUrl, QTimer
 import numpy as np
+from typing import Optional
+from .live_channel import LiveChannel
+from ..core.plot_data import typed_array, float32, TYPED_ARRAY_JS
+
+try:
+    import pyqtgraph as pg
+except ImportError:  # no pyqtgraph: persistent Plotly page fed through runJavaScript
+    pg = None
 
 class LiveView(QWidget):
-    """Plotly in QWebEngineView for live spectrum display."""
+    """
+    Live spectrum display. Each frame only replaces the trace data of an existing plot:
+    a pyqtgraph PlotWidget when pyqtgraph is installed, otherwise a Plotly page that is
+    loaded once (plotly.js from the local plotly package, no network) and updated via JS.
+
+    Frames are pulled from a LiveChannel by a timer at no more than max_fps; frames that
+    arrive faster are dropped (latest wins) and counted in the status line.
+    """
     def __init__(self, parent=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
+        self._x = np.empty(0)
+        self.channel: Optional[LiveChannel] = None
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._poll)
+        self.stats = QLabel("", self)
+        self.layout.addWidget(self.stats)
+        if pg is not None:
+            self._init_native()
+        else:
+            self._init_web()
+
+    # -- pyqtgraph ---------------------------------------------------------
+    def _init_native(self):
+        self.plot = pg.PlotWidget(self)
+        self.plot.setBackground("w")
+        self.plot.showGrid(x=True, y=True, alpha=0.3)
+        self.plot.setLabel("bottom", "Pixel")
+        self.plot.setLabel("left", "Counts")
+        self.plot.setTitle("Live Spectrum")
+        self.curve = self.plot.plot(pen=pg.mkPen("#1f77b4", width=1))
+        # Draw at most ~one point per screen pixel and only the visible range
+        self.curve.setDownsampling(auto=True, method="peak")
+        self.curve.setClipToView(True)
+        self.layout.addWidget(self.plot, 1) # Set stretch factor to 1
+
+    def _show_native(self, y: np.ndarray, title: str):
+        self.curve.setData(self._x, float32(y), skipFiniteCheck=True)
+        self.plot.setTitle(title)
+
+    # -- Plotly page fallback ---------------------------------------------
+    def _init_web(self):
+        from PyQt5.QtWebEngineWidgets import QWebEngineView
+        import plotly
+        js = Path(plotly.__file__).parent / "package_data" / "plotly.min.js"
+        html = f"""<html><head><meta charset="utf-8"><script src="{js.name}"></script></head>
+<body style="margin:0"><div id="plot" style="width:100vw;height:100vh"></div><script>
+Plotly.newPlot("plot", [{{y: [0], mode: "lines", name: "spectrum"}}],
+               {{title: {{text: "Live Spectrum"}}, margin: {{t: 40}}}}, {{responsive: true}});
+{TYPED_ARRAY_JS}
+function liveUpdate(y, title) {{
+  Plotly.restyle("plot", {{y: [decodeTyped(y)]}}, [0]);
+  Plotly.relayout("plot", {{"title.text": title}});
+}}
+</script></body></html>"""
+        self._ready = False
+        self._pending = None
         self.web = QWebEngineView(self)
-        self.layout.addWidget(self.web, 1) # Set stretch factor to 1
-        self._fig = go.Figure()
-        self._fig.update_layout(title_text="Live Spectrum")
-        self._fig.add_trace(go.Scatter(y=[0], mode="lines", name="spectrum"))
-        self._push_fig()
+        self.web.loadFinished.connect(self._on_loaded)
+        # Base URL in plotly's package_data so the <script src> resolves to the local file
+        self.web.setHtml(html, QUrl.fromLocalFile(str(js.parent) + "/"))
+        self.layout.addWidget(self.web, 1)
+
+    def _on_loaded(self, ok: bool):
+        self._ready = ok
+        if ok and self._pending is not None:
+            self._show_web(*self._pending)
+            self._pending = None
+
+    def _show_web(self, y: np.ndarray, title: str):
+        if not self._ready:
+            self._pending = (y, title)  # only the latest frame is kept until the page is up
+            return
+        self.web.page().runJavaScript(self.web_update_js(y, title))
+
+    @staticmethod
+    def web_update_js(y: np.ndarray, title: str) -> str:
+        """JS call that shows one frame on the Plotly page."""
+        # float32 buffer as base64: ~4x smaller than a JSON number list and no float formatting
+        return f"liveUpdate({json.dumps(typed_array(y))}, {json.dumps(title)});"
+
+    # -- frame pacing --------------------------------------------------------
+    def attach(self, channel: LiveChannel, max_fps: float = 30.0):
+        self.channel = channel
+        self._timer.setInterval(max(1, int(round(1000.0 / max(max_fps, 0.1)))))
+
+    def start(self):
+        if self.channel:
+            self.channel.reset()
+            self._update_stats()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._poll()  # show the last frame of the run
+
+    def _poll(self):
+        if not self.channel:
+            return
+        frame = self.channel.take()
+        if frame is not None:
+            self.update_live(*frame)
+            self._update_stats()
 
-    def _push_fig(self):
-        html = pio.to_html(self._fig, full_html=True, include_plotlyjs="cdn")
-        # Directly set HTML (no QUrl / temp file needed)
-        self.web.setHtml(html)
+    def _update_stats(self):
+        c = self.channel
+        self.stats.setText(f"displayed {c.displayed} | dropped {c.dropped} | received {c.received}")
 
     @pyqtSlot(object, float, float, str)
     def update_live(self, y: object, peak: float, it_ms: float, label: str):
         if isinstance(y, np.ndarray) and y.size:
-            self._fig.data = []
-            self._fig.add_trace(go.Scatter(y=y.tolist(), mode="lines", name=f"{label}"))
-            self._fig.update_layout(title=f"Live: {label} | peak={peak:.0f} | IT={it_ms:.2f} ms")
-            self._push_fig()
+            if self._x.size != y.size:
+                self._x = np.arange(y.size, dtype=np.float32)
+            title = f"Live: {label} | peak={peak:.0f} | IT={it_ms:.2f} ms"
+            if pg is not None:
+                self._show_native(y, title)
+            else:
+                self._show_web(y, title)
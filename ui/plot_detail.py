@@ -0,0 +1,68 @@
+import json
+from PyQt5.QtCore import QObject, pyqtSlot
+
+from ..core.plot_data import TYPED_ARRAY_JS
+
+# post_script for plotly.io.to_html (plotly substitutes {plot_id}). Connects to the page's
+# QWebChannel and, after every zoom/pan/reset, asks the "detail" object for the traces of
+# the visible range and swaps them in with Plotly.restyle. One request is in flight at a
+# time; the latest range requested meanwhile is sent when it returns. Trace arrays arrive
+# as base64 typed arrays (core.plot_data.typed_array).
+ZOOM_SCRIPT = TYPED_ARRAY_JS + """
+(function() {
+  var gd = document.getElementById('{plot_id}');
+  if (!gd || !window.qt || !qt.webChannelTransport) return;
+  var s = document.createElement('script');
+  s.src = 'qrc:///qtwebchannel/qwebchannel.js';
+  s.onload = function() {
+    new QWebChannel(qt.webChannelTransport, function(ch) {
+      var detail = ch.objects.detail;
+      if (!detail) return;
+      var busy = false, pending = null;
+      function visible(ax) {
+        var a = gd.layout[ax];
+        return (!a || a.autorange || !a.range) ? null : [a.range[0], a.range[1]];
+      }
+      function send(req) {
+        busy = true;
+        detail.fetch(JSON.stringify(req), function(res) {
+          if (res) {
+            var d = JSON.parse(res);
+            for (var k in d.update) d.update[k] = d.update[k].map(decodeTyped);
+            Plotly.restyle(gd, d.update, d.traces);
+          }
+          busy = false;
+          if (pending) { var r = pending; pending = null; send(r); }
+        });
+      }
+      gd.on('plotly_relayout', function(ev) {
+        var axes = Object.keys(ev).some(function(k) { return k.indexOf('xaxis') === 0 || k.indexOf('yaxis') === 0; });
+        if (!axes) return;
+        var req = {x: visible('xaxis'), y: visible('yaxis')};
+        if (busy) pending = req; else send(req);
+      });
+    });
+  };
+  document.head.appendChild(s);
+})();
+"""
+
+class DetailBridge(QObject):
+    """
+    Web channel object ("detail") of one figure view: serves the decimated traces of the
+    visible range from the full-resolution source (core.decimate LineDetail/HeatmapDetail).
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.source = None
+
+    @pyqtSlot(str, result=str)
+    def fetch(self, req_json: str) -> str:
+        if self.source is None:
+            return ""
+        from ..core.decimate import detail_update
+        try:
+            return json.dumps(detail_update(self.source, json.loads(req_json)))
+        except Exception as e:
+            print(f"Plot detail request failed: {e}")
+            return ""
@@ -4,7 +4,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import pyqtSignal, Qt
 from ..core.config import AppConfig
-from ..core.port_autodetect import autodetect_ports
+from ..core.port_autodetect import autodetect_for_config
 
 class RunPlanWidget(QWidget):
     startClicked = pyqtSignal()
@@ -85,9 +85,11 @@ class RunPlanWidget(QWidget):
         self.cfg.serial.cube_port = text
 
     def _rescan_ports(self):
-        detected_ports = autodetect_ports()
+        detected_ports = autodetect_for_config(self.cfg, force_scan=True)
         self.cfg.serial.obis_port = detected_ports["obis_port"]
         self.cfg.serial.cube_port = detected_ports["cube_port"]
+        if detected_ports["relay_port"]:
+            self.cfg.serial.relay_port = detected_ports["relay_port"]
         self.obis_port_edit.setText(self.cfg.serial.obis_port)
         self.cube_port_edit.setText(self.cfg.serial.cube_port)
 